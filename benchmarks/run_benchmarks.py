@@ -0,0 +1,225 @@
+# Times the pipeline stages on synthetic data at several scales and compares against a stored baseline.
+#
+#   python benchmarks/run_benchmarks.py                          # all cases at 1x, 10x, 100x
+#   python benchmarks/run_benchmarks.py --cases flatten_ticks --scales 1,10
+#   python benchmarks/run_benchmarks.py --save-baseline          # record benchmarks/baseline.json
+#
+# Each (case, scale) runs in its own forked process, so peak RSS is that case's and setup never leaks
+# between cases. Wall time is the best of --repeat timed runs; peak traced memory comes from one more
+# run under tracemalloc, kept separate so tracing does not inflate the timings.
+import argparse
+import gc
+import json
+import multiprocessing
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path[:0] = [str(BENCH_DIR.parent / "src"), str(BENCH_DIR)]
+
+import numpy as np
+import pandas as pd
+import synthetic
+
+DEFAULT_BASELINE = BENCH_DIR / "baseline.json"
+DEFAULT_OUTPUT = BENCH_DIR / "results" / "latest.json"
+
+
+def _data_dir(workdir: Path, scale: int) -> Path:
+    # ES history at scale x the 60-day sample, generated once per scale and shared by the cases that need it
+    path = workdir / f"data_{scale}x"
+    if not (path / "es_bars").exists():
+        synthetic.write_data_dir(path, synthetic.SAMPLE_DAYS * scale)
+    return path
+
+
+def _setup_flatten_ticks(workdir, scale):
+    from AuctionDataFetcher import AuctionDataFetcher
+    fetcher = AuctionDataFetcher(save_path=workdir / "fetcher", use_cache=False)
+    quote_frames = list(synthetic.make_quote_frames(scale).groupby(level=0))
+    return lambda: [len(df) for df in fetcher._iter_flat_ticks(quote_frames)], sum(len(df) for _, df in quote_frames)
+
+
+def _setup_chain_snapshot(workdir, scale):
+    # the per-expiration step of AuctionDataFetcher.run after flattening: 0DTE chain snapshot, auction ATM record
+    # and the intraday quotes of the strikes around the forward
+    from AuctionDataFetcher import AuctionDataFetcher
+    from ChainSnapshot import ChainSnapshot
+    fetcher = AuctionDataFetcher(save_path=workdir / "fetcher", use_cache=False)
+    quote_frames = synthetic.make_quote_frames(scale).groupby(level=0)
+    days = [df[df["date"] == df["expiration"]] for df in fetcher._iter_flat_ticks(quote_frames)]
+
+    def run():
+        for df_0dte in days:
+            chain = ChainSnapshot.from_ticks(df_0dte)
+            record = fetcher._atm_record(chain)
+            if record is not None:
+                chain.to_frame(chain.nearest(record["forward"], 2 * fetcher.n_wings + 1))
+
+    return run, sum(len(df) for df in days)
+
+
+def _setup_summarize_daily_stats(workdir, scale):
+    from VolatilityEstimator import VolatilityEstimator
+    estimator = VolatilityEstimator(_data_dir(workdir, scale), resample_interval="5min")
+    return lambda: estimator.summarize_daily_stats(), len(estimator.df)
+
+
+def _forecaster(workdir, n_paths):
+    from JumpDiffusionForecaster import JumpDiffusionForecaster
+    return JumpDiffusionForecaster(_data_dir(workdir, 1), n_paths=n_paths, seed=7)
+
+
+def _setup_simulate_paths(workdir, scale):
+    forecaster = _forecaster(workdir, 1000 * scale)
+    params = forecaster.calibrate()
+    S0, _ = forecaster._latest_session_prices()
+    return lambda: forecaster.simulate_paths(S0, **params), forecaster.n_paths
+
+
+def _setup_grid_search(workdir, scale):
+    forecaster = _forecaster(workdir, 200 * scale)
+    return lambda: forecaster.grid_search(n_samples=25), forecaster.n_paths
+
+
+def _setup_preprocessor_run(workdir, scale):
+    from AuctionVolPreprocessor import AuctionVolPreprocessor
+    preprocessor = AuctionVolPreprocessor(_data_dir(workdir, scale))
+    return lambda: preprocessor.run(), len(preprocessor.es_store.load())
+
+
+# case -> setup(workdir, scale) returning (run, input size); scales multiply SPXW expiration days for the tick
+# cases, the 60-day ES sample for the bar cases and 1000 (simulate) / 200 (grid search) paths for the forecaster
+CASES = {
+    "flatten_ticks": _setup_flatten_ticks,
+    "chain_snapshot": _setup_chain_snapshot,
+    "summarize_daily_stats": _setup_summarize_daily_stats,
+    "simulate_paths": _setup_simulate_paths,
+    "grid_search": _setup_grid_search,
+    "preprocessor_run": _setup_preprocessor_run,
+}
+
+
+def _run_case(case: str, scale: int, repeat: int, workdir: str) -> dict:
+    run, n_input = CASES[case](Path(workdir), scale)
+    run()  # warm-up: imports, store caches, first-touch allocations
+
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss_unit = 1 if sys.platform == "darwin" else 1024
+    return {
+        "case": case,
+        "scale": scale,
+        "n_input": int(n_input),
+        "wall_s": min(timings),
+        "wall_runs_s": timings,
+        "peak_traced_mb": peak / 2**20,
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * rss_unit / 2**20,
+    }
+
+
+def _meta() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "machine": platform.machine(),
+        "cpus": multiprocessing.cpu_count(),
+    }
+
+
+def compare(results: list, baseline: dict, tolerance: float, min_wall_s=0.05) -> list:
+    # a regression is a wall time or peak traced memory more than `tolerance` above the baseline entry;
+    # timings below min_wall_s are timer noise and are reported but never flagged
+    reference = {(r["case"], r["scale"]): r for r in baseline.get("results", [])}
+    regressions = []
+    for result in results:
+        base = reference.get((result["case"], result["scale"]))
+        if base is None:
+            continue
+        for metric in ("wall_s", "peak_traced_mb"):
+            ratio = result[metric] / base[metric] if base[metric] > 0 else 1.0
+            result[f"{metric}_vs_baseline"] = ratio
+            if metric == "wall_s" and result[metric] < min_wall_s:
+                continue
+            if ratio > 1 + tolerance:
+                regressions.append({"case": result["case"], "scale": result["scale"], "metric": metric,
+                                    "baseline": base[metric], "current": result[metric], "ratio": ratio})
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the VolAuction pipeline stages on synthetic data.")
+    parser.add_argument("--cases", default=",".join(CASES), help="comma-separated subset of: " + ", ".join(CASES))
+    parser.add_argument("--scales", default="1,10,100", help="comma-separated data scale multipliers")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT)
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed fractional slowdown before flagging")
+    parser.add_argument("--min-wall", type=float, default=0.05, help="never flag wall times below this many seconds")
+    parser.add_argument("--workdir", type=Path, default=None, help="keep generated data here between runs")
+    args = parser.parse_args(argv)
+
+    cases = [c.strip() for c in args.cases.split(",") if c.strip()]
+    unknown = set(cases) - set(CASES)
+    if unknown:
+        parser.error(f"unknown case(s): {', '.join(sorted(unknown))}")
+    scales = [int(s) for s in args.scales.split(",")]
+
+    workdir = args.workdir or Path(tempfile.mkdtemp(prefix="volauction-bench-"))
+    workdir.mkdir(parents=True, exist_ok=True)
+    context = multiprocessing.get_context("fork")
+    results = []
+    for case in cases:
+        for scale in scales:
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                result = pool.submit(_run_case, case, scale, args.repeat, str(workdir)).result()
+            results.append(result)
+            print(f"{case:<24} {scale:>4}x  {result['wall_s']:9.3f} s  {result['peak_traced_mb']:9.1f} MB traced"
+                  f"  {result['max_rss_mb']:9.1f} MB rss", flush=True)
+
+    regressions = []
+    if args.baseline.exists() and not args.save_baseline:
+        regressions = compare(results, json.loads(args.baseline.read_text()), args.tolerance, args.min_wall)
+        for r in regressions:
+            print(f"REGRESSION {r['case']} {r['scale']}x {r['metric']}: {r['baseline']:.3f} -> {r['current']:.3f} "
+                  f"({r['ratio']:.2f}x)")
+
+    report = {"meta": _meta(), "tolerance": args.tolerance, "results": results, "regressions": regressions}
+    target = args.baseline if args.save_baseline else args.output
+    target.parent.mkdir(parents=True, exist_ok=True)
+    target.write_text(json.dumps(report, indent=2))
+    print(f"Wrote {target}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from ESBarStore import ESBarStore
+
+SESSION_MINUTES = 23 * 60
+SAMPLE_DAYS = 60
+
+
+def make_es_bars(n_days=SAMPLE_DAYS, end="2025-03-31", S0=5700.0, minute_vol=0.0004, seed=0) -> pd.DataFrame:
+    # Globex-style sessions: 18:00 the evening before to 17:00, one per weekday, with a jump-prone 09:30 bar
+    rng = np.random.default_rng(seed)
+    days = pd.bdate_range(end=end, periods=n_days)
+    minutes = np.arange(SESSION_MINUTES)
+    wall = (days.to_numpy()[:, None] - np.timedelta64(6, "h") + minutes[None, :].astype("timedelta64[m]")).ravel()
+    index = pd.DatetimeIndex(wall).tz_localize("America/New_York", nonexistent="shift_forward", ambiguous=False)
+
+    returns = rng.standard_normal(len(index)) * minute_vol
+    open_bar = (index.hour == 9) & (index.minute == 30)
+    returns[open_bar] += rng.standard_normal(open_bar.sum()) * 20 * minute_vol
+    close = S0 * np.exp(np.cumsum(returns))
+    open_ = np.concatenate([[S0], close[:-1]])
+    wick = np.abs(rng.standard_normal((2, len(index)))) * minute_vol * 0.5
+    to_tick = lambda x: np.round(x * 4) / 4
+    return pd.DataFrame({
+        "Open": to_tick(open_),
+        "High": to_tick(np.maximum(open_, close) * (1 + wick[0])),
+        "Low": to_tick(np.minimum(open_, close) * (1 - wick[1])),
+        "Close": to_tick(close),
+        "Volume": rng.integers(0, 2000, len(index)),
+    }, index=index.rename("Datetime"))
+
+
+def make_bulk_hist_day(date, forward=5700.0, n_strikes=80, strike_step=5, tick_ms=60_000, seed=0) -> list:
+    # one expiration of /v2/bulk_hist/option/quote rows: {"ticks": [[ms, bid_sz, bid_ex, bid, bid_cond, ask_sz, ask_ex, ask, ask_cond, date], ...], "contract": {...}}
+    rng = np.random.default_rng(seed)
+    date = pd.Timestamp(date)
+    exp = int(date.strftime("%Y%m%d"))
+    ms = np.arange((9 * 60 + 20) * 60_000, 16 * 60 * 60_000 + 1, tick_ms)
+    strikes = forward - forward % strike_step + strike_step * (np.arange(n_strikes) - n_strikes // 2)
+
+    rows = []
+    for K in strikes:
+        for right in "CP":
+            time_value = 8 * np.exp(-((K - forward) / 40) ** 2) + 0.05
+            intrinsic = max(forward - K, 0) if right == "C" else max(K - forward, 0)
+            mid = np.maximum(intrinsic + time_value * (1 + 0.02 * rng.standard_normal(len(ms))), 0.05)
+            half = 0.05 + 0.002 * abs(K - forward)
+            ticks = np.column_stack([
+                ms, rng.integers(1, 100, len(ms)), np.full(len(ms), 5), np.round(mid - half, 2), np.zeros(len(ms)),
+                rng.integers(1, 100, len(ms)), np.full(len(ms), 5), np.round(mid + half, 2), np.zeros(len(ms)),
+                np.full(len(ms), exp),
+            ])
+            rows.append({
+                "ticks": ticks.tolist(),
+                "contract": {"root": "SPXW", "expiration": exp, "strike": int(K * 1000), "right": right},
+            })
+    return rows
+
+
+def make_quote_frames(n_days=1, end="2025-03-31", **day_kwargs) -> pd.DataFrame:
+    # bulk quote frames stacked one row per contract and indexed by date, so grouping on the date gives the
+    # (date, frame) pairs _iter_daily_quotes yields; the tick lists of one generated day are shared by every
+    # date, so large scales cost flattening time rather than generator memory
+    template = make_bulk_hist_day(end, **day_kwargs)
+    frames = []
+    for date in pd.bdate_range(end=end, periods=n_days):
+        exp = int(date.strftime("%Y%m%d"))
+        frames.append(pd.DataFrame({
+            "ticks": [row["ticks"] for row in template],
+            "contract": [{**row["contract"], "expiration": exp} for row in template],
+            "date": date,
+        }))
+    return pd.concat(frames, ignore_index=True).set_index("date")
+
+
+def write_data_dir(data_path, n_days=SAMPLE_DAYS, seed=0) -> Path:
+    # a data/ directory the pipeline classes can run against: ES bar store, SPX daily, auction quotes, ATM map
+    data_path = Path(data_path)
+    data_path.mkdir(parents=True, exist_ok=True)
+    bars = make_es_bars(n_days, seed=seed)
+    ESBarStore(data_path).write(bars)
+
+    closes = bars[(bars.index.hour == 16) & (bars.index.minute == 0)]["Close"]
+    spx = pd.DataFrame({
+        "date": closes.index.normalize(), "Open": closes.to_numpy(), "Close": closes.to_numpy(),
+        "High": closes.to_numpy(), "Low": closes.to_numpy(), "Volume": 0,
+    })
+    spx.to_csv(data_path / "spx_spot_daily.csv", index=False)
+
+    dates = closes.index.tz_localize(None).normalize()
+    strikes = (np.round(closes.to_numpy() / 5) * 5 * 1000).astype(np.int64)
+    quotes = pd.DataFrame({
+        "date": dates, "root": "SPXW", "strike": strikes, "forward": closes.to_numpy(),
+        "call_mid": 8.0, "put_mid": 8.0, "call_bid": 7.9, "call_ask": 8.1, "put_bid": 7.9, "put_ask": 8.1,
+    })
+    quotes.to_parquet(data_path / "auction_daily_quotes.parquet", index=False)
+    quotes[["date", "strike"]].to_csv(data_path / "atm_strike_map.csv", index=False)
+    return data_path
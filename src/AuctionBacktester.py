@@ -0,0 +1,178 @@
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterable, Optional, Sequence, Tuple
+from AuctionDataFetcher import iter_intraday_files
+from BlackScholesPricer import BlackScholesPricer, STRIKE_SCALE
+from ChainSnapshot import ChainSnapshot
+from ESBarStore import ESBarStore
+
+MS_PER_MINUTE = 60_000
+RESULT_COLUMNS = [
+    "date", "threshold", "hedge_interval", "strike", "auction_iv", "model_vol", "edge", "side",
+    "entry_px", "exit_px", "option_pnl", "hedge_pnl", "costs", "n_hedges", "pnl",
+]
+
+
+def _clock_ms(clock: str) -> int:
+    hours, minutes = map(int, clock.split(":"))
+    return (hours * 60 + minutes) * MS_PER_MINUTE
+
+
+def _load_straddle_quotes(quote_file: Path, date: pd.Timestamp, entry_ms: int) -> pd.DataFrame:
+    quotes = pd.read_parquet(quote_file, columns=["timestamp", "bid_px", "ask_px", "strike", "right"])
+    quotes["right"] = quotes["right"].astype(str)
+    # day files hold the strikes around the forward; trade the one nearest the parity forward at entry
+    chain = ChainSnapshot.from_ticks(quotes, date)
+    atm = chain.atm(max(entry_ms, chain.times[0])) if not chain.empty else None
+    if atm is not None:
+        quotes = quotes[quotes["strike"] == chain.strikes[atm]]
+    calls = quotes[quotes["right"] == "C"].drop_duplicates("timestamp", keep="last").set_index("timestamp")
+    puts = quotes[quotes["right"] == "P"].drop_duplicates("timestamp", keep="last").set_index("timestamp")
+    straddle = calls[["bid_px", "ask_px", "strike"]].join(puts[["bid_px", "ask_px"]], how="inner", lsuffix="_c", rsuffix="_p")
+    quoted = (straddle[["bid_px_c", "ask_px_c", "bid_px_p", "ask_px_p"]] > 0).all(axis=1)
+    return straddle[quoted].sort_index()
+
+
+def _load_es_session(data_path: Path, date: pd.Timestamp) -> pd.Series:
+    day = date.strftime("%Y-%m-%d")
+    closes = ESBarStore(data_path).load(f"{day} 09:00", f"{day} 16:15", columns=["Close"])["Close"]
+    ms_of_day = (closes.index - closes.index.normalize()) // pd.Timedelta(milliseconds=1)
+    return pd.Series(closes.to_numpy(dtype=np.float64), index=np.asarray(ms_of_day, dtype=np.int64))
+
+
+def _simulate_day(straddle: pd.DataFrame, es: pd.Series, model_vol: float, threshold: float, hedge_interval: int,
+                  entry_ms: int, exit_ms: int, slippage: float, es_cost: float, multiplier: float,
+                  pricer: BlackScholesPricer) -> Optional[dict]:
+    ts = straddle.index.to_numpy()
+    start = np.searchsorted(ts, entry_ms, side="left")
+    stop = np.searchsorted(ts, exit_ms, side="right") - 1
+    if start >= len(ts) or stop <= start or es.empty:
+        return None
+
+    row = straddle.iloc[start]
+    K = row["strike"] / STRIKE_SCALE
+    c_mid = 0.5 * (row["bid_px_c"] + row["ask_px_c"])
+    p_mid = 0.5 * (row["bid_px_p"] + row["ask_px_p"])
+    forward = K + c_mid - p_mid
+    T0 = pricer.time_to_close(ts[start])
+    auction_iv = np.nanmean(pricer.implied_vol([c_mid, p_mid], forward, K, T0, ["C", "P"]))
+    edge = auction_iv - model_vol
+    side = -1 if edge > threshold else 1 if edge < -threshold else 0
+
+    result = {
+        "strike": row["strike"], "auction_iv": auction_iv, "model_vol": model_vol, "edge": edge, "side": side,
+        "entry_px": np.nan, "exit_px": np.nan, "option_pnl": 0.0, "hedge_pnl": 0.0, "costs": 0.0, "n_hedges": 0, "pnl": 0.0,
+    }
+    if side == 0 or not np.isfinite(auction_iv):
+        return result
+
+    def fill(i, direction):
+        # cross part of the quoted spread in the direction of the trade
+        q = straddle.iloc[i]
+        mid = 0.5 * (q["bid_px_c"] + q["ask_px_c"] + q["bid_px_p"] + q["ask_px_p"])
+        half_spread = 0.5 * (q["ask_px_c"] - q["bid_px_c"] + q["ask_px_p"] - q["bid_px_p"])
+        return mid + direction * slippage * half_spread
+
+    es_ts = es.index.to_numpy()
+    es_px = es.to_numpy()
+
+    def es_asof(t):
+        i = np.searchsorted(es_ts, t, side="right") - 1
+        return es_px[max(i, 0)]
+
+    # hedge against SPX-equivalent prices: ES less the basis to the put-call parity forward at entry
+    basis = es_asof(ts[start]) - forward
+    entry_px = fill(start, side)
+    exit_px = fill(stop, -side)
+
+    hedge_times = np.arange(ts[start], ts[stop], hedge_interval * MS_PER_MINUTE)
+    position, hedge_pnl, costs = 0.0, 0.0, 0.0
+    last_px = None
+    for t in hedge_times:
+        S = es_asof(t) - basis
+        if last_px is not None:
+            hedge_pnl += position * (S - last_px)
+        greeks = pricer.greeks(S, K, pricer.time_to_close(t), auction_iv, ["C", "P"])
+        target = -side * greeks["delta"].sum()
+        costs += abs(target - position) * es_cost
+        position, last_px = target, S
+
+    S_exit = es_asof(ts[stop]) - basis
+    hedge_pnl += position * (S_exit - last_px)
+    costs += abs(position) * es_cost
+
+    option_pnl = side * (exit_px - entry_px)
+    result.update({
+        "entry_px": entry_px, "exit_px": exit_px, "option_pnl": option_pnl * multiplier,
+        "hedge_pnl": hedge_pnl * multiplier, "costs": costs * multiplier, "n_hedges": len(hedge_times),
+        "pnl": (option_pnl + hedge_pnl - costs) * multiplier,
+    })
+    return result
+
+
+def _run_backtest_day(task) -> list:
+    data_path, quote_file, date, model_vol, configs, params = task
+    straddle = _load_straddle_quotes(quote_file, date, params["entry_ms"])
+    es = _load_es_session(data_path, date)
+    pricer = BlackScholesPricer()
+
+    rows = []
+    for threshold, hedge_interval in configs:
+        result = _simulate_day(straddle, es, model_vol, threshold, hedge_interval, pricer=pricer, **params)
+        if result is not None:
+            rows.append({"date": date, "threshold": threshold, "hedge_interval": hedge_interval, **result})
+    return rows
+
+
+class AuctionBacktester:
+    def __init__(self, data_path="data", entry_time="09:30", exit_time="15:55", slippage=0.5, es_cost=0.125,
+                 multiplier=100, n_workers=1):
+        self.data_path = Path(data_path)
+        self.quotes_path = self.data_path / "intraday_by_day"
+        self.entry_ms = _clock_ms(entry_time)
+        self.exit_ms = _clock_ms(exit_time)
+        self.slippage = slippage
+        self.es_cost = es_cost
+        self.multiplier = multiplier
+        self.n_workers = n_workers
+
+    def _quote_files(self):
+        return iter_intraday_files(self.quotes_path)
+
+    def _tasks(self, model_vols: pd.Series, configs: Sequence[Tuple[float, int]]) -> Iterable[tuple]:
+        model_vols = model_vols.copy()
+        model_vols.index = pd.to_datetime(model_vols.index).normalize()
+        params = {
+            "entry_ms": self.entry_ms, "exit_ms": self.exit_ms, "slippage": self.slippage,
+            "es_cost": self.es_cost, "multiplier": self.multiplier,
+        }
+        for date, quote_file in self._quote_files():
+            if date in model_vols.index and np.isfinite(model_vols[date]):
+                yield self.data_path, quote_file, date, float(model_vols[date]), list(configs), params
+
+    def sweep(self, model_vols: pd.Series, thresholds: Sequence[float], hedge_intervals: Sequence[int]) -> pd.DataFrame:
+        configs = [(th, hi) for th in thresholds for hi in hedge_intervals]
+        tasks = list(self._tasks(model_vols, configs))
+        if self.n_workers <= 1:
+            day_rows = map(_run_backtest_day, tasks)
+            rows = [row for rows in day_rows for row in rows]
+        else:
+            with ProcessPoolExecutor(max_workers=self.n_workers) as pool:
+                rows = [row for rows in pool.map(_run_backtest_day, tasks) for row in rows]
+
+        results = pd.DataFrame(rows, columns=RESULT_COLUMNS)
+        return results.sort_values(["threshold", "hedge_interval", "date"]).reset_index(drop=True)
+
+    def run(self, model_vols: pd.Series, threshold=0.0, hedge_interval=5) -> pd.DataFrame:
+        return self.sweep(model_vols, [threshold], [hedge_interval])
+
+    def summarize(self, results: pd.DataFrame) -> pd.DataFrame:
+        grouped = results.groupby(["threshold", "hedge_interval"])
+        return pd.DataFrame({
+            "n_trades": grouped["side"].apply(lambda s: int((s != 0).sum())),
+            "total_pnl": grouped["pnl"].sum(),
+            "mean_pnl": grouped["pnl"].mean(),
+            "sharpe": grouped["pnl"].mean() / grouped["pnl"].std() * np.sqrt(252),
+        }).reset_index()
@@ -1,26 +1,96 @@
-import requests
+import os
+import re
+import numpy as np
 import pandas as pd
-from datetime import datetime, timedelta, time
+from datetime import datetime, timedelta
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, Optional, Sequence, Tuple
+from ChainSnapshot import ChainSnapshot
+from Instrumentation import instrumented, record_io
+from ThetaClient import ThetaClient
+
+# bulk_hist quote tick layout: [ms_of_day, bid_size, bid_exchange, bid, bid_condition, ask_size, ask_exchange, ask, ask_condition, date]
+TICK_FIELDS = {"timestamp": 0, "bid_sz": 1, "bid_px": 3, "ask_sz": 5, "ask_px": 7}
+TICK_DTYPES = {"timestamp": np.int32, "bid_sz": np.int32, "bid_px": np.float32, "ask_sz": np.int32, "ask_px": np.float32}
+AUCTION_WINDOW_MS = ((9 * 60 + 25) * 60_000, (9 * 60 + 35) * 60_000)
+_DAY_DIR = re.compile(r"date=(\d{4}-\d{2}-\d{2})$")
+_LEGACY_DAY_FILE = re.compile(r"intraday_quotes_(\d{4}-\d{2}-\d{2})\.parquet$")
+
+
+def iter_intraday_files(by_day_path: Path) -> Iterator[Tuple[pd.Timestamp, Path]]:
+    # date=YYYY-MM-DD/ partition directories, plus the flat intraday_quotes_YYYY-MM-DD.parquet files of older runs
+    files = {}
+    for path in sorted(Path(by_day_path).glob("intraday_quotes_*.parquet")):
+        match = _LEGACY_DAY_FILE.search(path.name)
+        if match:
+            files[match.group(1)] = path
+    for path in sorted(Path(by_day_path).glob("date=*")):
+        match = _DAY_DIR.search(path.name)
+        if match and path.is_dir():
+            files[match.group(1)] = path
+    for day in sorted(files):
+        yield pd.Timestamp(day), files[day]
+
+
+def _run_root_shard(task) -> Tuple[str, pd.DataFrame]:
+    api_base, save_path, root, max_workers, use_cache, incremental = task
+    fetcher = AuctionDataFetcher(api_base, save_path, max_workers, use_cache, option_root=root, root_partition=True)
+    df_daily, _ = fetcher.run(incremental)
+    return root, df_daily
+
 
 class AuctionDataFetcher:
-    def __init__(self, api_base="http://127.0.0.1:25510", save_path="data"):
+    def __init__(self, api_base="http://127.0.0.1:25510", save_path="data", max_workers=4, use_cache=True,
+                 option_root="SPXW", root_partition=False, n_wings=10):
         self.api_base = api_base
         self.save_path = Path(save_path)
-        self.save_path.mkdir(parents=True, exist_ok=True)
-        self.option_root = "SPXW"
+        self.option_root = option_root
+        # a partitioned root writes its whole data set under root=<ROOT>/, which is a data_path of its own downstream
+        self.out_path = self.save_path / f"root={option_root}" if root_partition else self.save_path
+        self.out_path.mkdir(parents=True, exist_ok=True)
         self.ivl = 12000 
+        self.n_wings = n_wings
         self.atm_strike_map = {}
+        self.client = ThetaClient(
+            api_base,
+            cache_dir=self.save_path / "raw_bulk_quotes" if use_cache else None,
+            max_workers=max_workers,
+        )
 
+    @staticmethod
+    def run_roots(roots: Sequence[str], api_base="http://127.0.0.1:25510", save_path="data", n_workers=None,
+                  max_workers=4, use_cache=True, incremental=False) -> Dict[str, pd.DataFrame]:
+        # one process per root shard; each keeps its own HTTP pool of max_workers threads
+        tasks = [(api_base, save_path, root, max_workers, use_cache, incremental) for root in roots]
+        with ProcessPoolExecutor(max_workers=n_workers or len(tasks)) as pool:
+            return dict(pool.map(_run_root_shard, tasks))
+
+    def _write_atomic(self, df, path: Path):
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        if path.suffix == ".csv":
+            df.to_csv(tmp_path, index=False)
+        else:
+            df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+        record_io(written=path)
+
+    def _persisted_expirations(self) -> set:
+        daily_file = self.out_path / "auction_daily_quotes.parquet"
+        if not daily_file.exists():
+            return set()
+        dates = pd.to_datetime(pd.read_parquet(daily_file, columns=["date"])["date"])
+        return set(dates.dt.strftime("%Y%m%d"))
+
+    @instrumented()
     def _fetch_expirations(self, days_back=63):
-        url = f"{self.api_base}/v2/list/expirations?root={self.option_root}"
-        response = requests.get(url).json()["response"]
+        response = self.client.get_response("/v2/list/expirations", {"root": self.option_root})
         today = datetime.today()
         cutoff = today - timedelta(days=days_back)
         return [str(exp) for exp in response if cutoff <= datetime.strptime(str(exp), "%Y%m%d") <= today]
 
-    def _fetch_daily_quotes(self, expirations):
-        all_quotes = []
+    def _quote_requests(self, expirations):
+        today = datetime.today().strftime("%Y%m%d")
         for exp in expirations:
             params = {
                 "root": self.option_root,
@@ -29,104 +99,143 @@ class AuctionDataFetcher:
                 "end_date": exp,
                 "ivl": self.ivl
             }
-            r = requests.get(f"{self.api_base}/v2/bulk_hist/option/quote", params=params)
-            data = r.json()["response"]
-            df = pd.DataFrame(data)
-            df["date"] = pd.to_datetime(exp)
-            all_quotes.append(df)
-        df_all = pd.concat(all_quotes, ignore_index=True)
-        df_all["date"] = pd.to_datetime(df_all["date"])
-        df_all.set_index("date", inplace=True)
-        return df_all
+            # a session that is still trading must not be frozen into the cache
+            cache_key = f"{self.option_root}_{exp}_{self.ivl}" if exp < today else None
+            yield "/v2/bulk_hist/option/quote", params, cache_key
+
+    def _iter_daily_quotes(self, expirations) -> Iterator[Tuple[pd.Timestamp, pd.DataFrame]]:
+        responses = self.client.fetch_many(self._quote_requests(expirations))
+        for exp, data in zip(expirations, responses):
+            yield pd.to_datetime(exp), pd.DataFrame(data)
+
+    @instrumented()
+    def _flatten_expiration(self, date, df_exp, window_ms: Optional[Tuple[int, int]] = None) -> pd.DataFrame:
+        tick_lists = [np.asarray(ticks, dtype=np.float64) for ticks in df_exp["ticks"]]
+        counts = np.array([len(ticks) for ticks in tick_lists], dtype=np.int64)
+        width = max(TICK_FIELDS.values()) + 1
+        ticks = np.concatenate([t for t in tick_lists if len(t)]) if counts.any() else np.empty((0, width))
+
+        contracts = pd.DataFrame(list(df_exp["contract"]))
+        contract_idx = np.repeat(np.arange(len(contracts)), counts)
+        if window_ms is not None:
+            keep = (ticks[:, 0] >= window_ms[0]) & (ticks[:, 0] <= window_ms[1])
+            ticks, contract_idx = ticks[keep], contract_idx[keep]
 
-    def _flatten_ticks(self, df_all):
-        rows = []
-        for idx, row in df_all.iterrows():
-            contract = row["contract"]
-            for tick in row["ticks"]:
-                rows.append({
-                    "timestamp": tick[0],
-                    "bid_sz": tick[1],
-                    "bid_px": tick[3],
-                    "ask_sz": tick[5],
-                    "ask_px": tick[7],
-                    "strike": contract["strike"],
-                    "right": contract["right"],
-                    "expiration": contract["expiration"],
-                    "date": idx
-                })
-        df = pd.DataFrame(rows)
-        df["date"] = pd.to_datetime(df["date"])
-        df["expiration"] = pd.to_datetime(df["expiration"])
-        return df
-
-    def _extract_0dte_auction(self, df_flat):
-        df_0dte = df_flat[df_flat["date"] == df_flat["expiration"]].copy()
-        df_0dte["timestamp"] = df_0dte["timestamp"].apply(
-            lambda x: (datetime.min + timedelta(milliseconds=x)).time()
+        columns = {name: ticks[:, i].astype(TICK_DTYPES[name]) for name, i in TICK_FIELDS.items()}
+        columns["strike"] = contracts["strike"].to_numpy(dtype=np.int32)[contract_idx]
+        columns["right"] = pd.Categorical.from_codes(
+            (contracts["right"].to_numpy() == "P").astype(np.int8)[contract_idx], categories=["C", "P"]
         )
-        window_start = (datetime.combine(datetime.today(), time(9, 30)) - timedelta(minutes=5)).time()
-        window_end = (datetime.combine(datetime.today(), time(9, 30)) + timedelta(minutes=5)).time()
-        df_auction = df_0dte[(df_0dte["timestamp"] >= window_start) & (df_0dte["timestamp"] <= window_end)].copy()
-        df_auction["mid_px"] = (df_auction["bid_px"] + df_auction["ask_px"]) / 2
-        df_auction = df_auction[df_auction["mid_px"] > 0]
-        return df_auction
-
-    def _find_atm_quotes(self, df_auction):
-        results = []
-        for date, group in df_auction.groupby("date"):
-            group["spread"] = group["ask_px"] - group["bid_px"]
-            best = group.loc[group["spread"].idxmin()]
-            atm_strike = best["strike"]
-            atm_call = group[(group["strike"] == atm_strike) & (group["right"] == "C")]
-            atm_put = group[(group["strike"] == atm_strike) & (group["right"] == "P")]
-
-            if not atm_call.empty and not atm_put.empty:
-                results.append({
-                    "date": date,
-                    "strike": atm_strike,
-                    "call_mid": atm_call["mid_px"].values[0],
-                    "put_mid": atm_put["mid_px"].values[0],
-                    "call_bid": atm_call["bid_px"].values[0],
-                    "call_ask": atm_call["ask_px"].values[0],
-                    "put_bid": atm_put["bid_px"].values[0],
-                    "put_ask": atm_put["ask_px"].values[0],
-                })
-                self.atm_strike_map[date] = atm_strike
-
-        df_daily = pd.DataFrame(results).sort_values("date")
-        df_daily.to_parquet(self.save_path / "auction_daily_quotes.parquet", index=False)
-        pd.DataFrame([
-            {"date": k, "strike": v} for k, v in self.atm_strike_map.items()
-        ]).to_csv(self.save_path / "atm_strike_map.csv", index=False)
+        columns["expiration"] = pd.to_datetime(contracts["expiration"].astype(str)).to_numpy(dtype="datetime64[ns]")[contract_idx]
+        columns["date"] = np.full(len(contract_idx), np.datetime64(pd.Timestamp(date), "ns"))
+        return pd.DataFrame(columns)
+
+    def _iter_flat_ticks(self, quote_frames: Iterable[Tuple[pd.Timestamp, pd.DataFrame]],
+                         window_ms: Optional[Tuple[int, int]] = None) -> Iterator[pd.DataFrame]:
+        for date, df_exp in quote_frames:
+            yield self._flatten_expiration(date, df_exp, window_ms)
+
+    def _atm_record(self, chain: ChainSnapshot) -> Optional[dict]:
+        # quotes at the first snapshot in the auction window, at the strike nearest the put-call parity forward
+        t_idx = np.searchsorted(chain.times, AUCTION_WINDOW_MS[0])
+        if t_idx >= len(chain.times) or chain.times[t_idx] > AUCTION_WINDOW_MS[1]:
+            return None
+        t_ms = chain.times[t_idx]
+        forward = chain.forward(t_ms)
+        k = chain.atm(t_ms, forward)
+        if k is None:
+            return None
+        mid = chain.mid(t_ms)
+        return {
+            "date": chain.date,
+            "root": self.option_root,
+            "strike": chain.strikes[k],
+            "forward": forward,
+            "call_mid": mid[k, 0],
+            "put_mid": mid[k, 1],
+            "call_bid": chain.bid[k, 0, t_idx],
+            "call_ask": chain.ask[k, 0, t_idx],
+            "put_bid": chain.bid[k, 1, t_idx],
+            "put_ask": chain.ask[k, 1, t_idx],
+        }
+
+    def _persisted_daily_quotes(self) -> pd.DataFrame:
+        daily_file = self.out_path / "auction_daily_quotes.parquet"
+        return pd.read_parquet(daily_file) if daily_file.exists() else pd.DataFrame()
+
+    @instrumented(rows_in=lambda self, records, incremental=False: len(records))
+    def _find_atm_quotes(self, records, incremental=False):
+        for record in records:
+            self.atm_strike_map[record["date"]] = record["strike"]
+
+        daily_file = self.out_path / "auction_daily_quotes.parquet"
+        df_daily = pd.DataFrame(records)
+        if incremental and daily_file.exists():
+            df_daily = pd.concat([pd.read_parquet(daily_file), df_daily], ignore_index=True)
+            df_daily = df_daily.drop_duplicates("date", keep="last")
+        df_daily = df_daily.sort_values("date").reset_index(drop=True)
+
+        self._write_atomic(df_daily, daily_file)
+        self._write_atomic(df_daily[["date", "strike"]], self.out_path / "atm_strike_map.csv")
         return df_daily
 
-    def _save_intraday_quotes(self, df_flat):
-        all_intraday = []
-        by_day_path = self.save_path / "intraday_by_day"
-        by_day_path.mkdir(parents=True, exist_ok=True)
+    @instrumented(rows_in=lambda self, day_frames, incremental=False: sum(len(df) for df in day_frames))
+    def _save_intraday_quotes(self, day_frames, incremental=False):
+        df_all = pd.concat(day_frames, ignore_index=True)
+        df_all["mid_px"] = (df_all["bid_px"] + df_all["ask_px"]) / 2
+        df_all["time"] = pd.to_timedelta(df_all["timestamp"], unit="ms")
 
-        for date in df_flat["date"].unique():
-            strike = self.atm_strike_map.get(date)
-            if not strike:
-                continue
-            df_day = df_flat[(df_flat["date"] == date) &
-                             (df_flat["strike"] == strike) &
-                             (df_flat["expiration"] == date)]
-            df_day["mid_px"] = (df_day["bid_px"] + df_day["ask_px"]) / 2
-            df_day["time"] = pd.to_timedelta(df_day["timestamp"], unit="ms")
-            all_intraday.append(df_day)
-            df_day.to_parquet(by_day_path / f"intraday_quotes_{date.strftime('%Y-%m-%d')}.parquet", index=False)
-
-        df_all = pd.concat(all_intraday)
-        df_all.to_parquet(self.save_path / "all_intraday_quotes.parquet", index=False)
+        # each day's near-ATM strikes are the one file of its date= partition, written through _write_atomic: a
+        # re-fetched day is replaced by a single os.replace, so a failed run never leaves a day empty or partial
+        for date, df_day in df_all.groupby("date"):
+            day_path = self.out_path / "intraday_by_day" / f"date={date:%Y-%m-%d}"
+            day_path.mkdir(parents=True, exist_ok=True)
+            self._write_atomic(df_day.drop(columns="date"), day_path / "intraday_quotes-0.parquet")
+
+        # the combined file is a full rewrite, so only full runs write it; incremental runs cost only their new days,
+        # and load_intraday_quotes() reads intraday_by_day/ as the combined view that stays current
+        if not incremental:
+            self._write_atomic(df_all, self.out_path / "all_intraday_quotes.parquet")
         return df_all
 
-    def run(self):
+    def load_intraday_quotes(self) -> pd.DataFrame:
+        days = []
+        for date, path in iter_intraday_files(self.out_path / "intraday_by_day"):
+            df_day = pd.read_parquet(path)
+            # partitioned days carry their date in the directory name only
+            df_day["date"] = pd.to_datetime(df_day["date"]) if "date" in df_day else date
+            days.append(df_day)
+        return pd.concat(days, ignore_index=True)
+
+    @instrumented()
+    def run(self, incremental=False):
         expirations = self._fetch_expirations()
-        df_all = self._fetch_daily_quotes(expirations)
-        df_flat = self._flatten_ticks(df_all)
-        df_auction = self._extract_0dte_auction(df_flat)
-        df_daily_quotes = self._find_atm_quotes(df_auction)
-        df_intraday = self._save_intraday_quotes(df_flat)
+        if incremental:
+            persisted = self._persisted_expirations()
+            expirations = [exp for exp in expirations if exp not in persisted]
+            print(f"Incremental update: {len(expirations)} new expiration(s)")
+            if not expirations:
+                return self._persisted_daily_quotes(), pd.DataFrame()
+        records, day_frames = [], []
+
+        # one expiration is flattened at a time and folded into its 0DTE chain snapshot; only the auction
+        # ATM quotes and the intraday quotes of the strikes around the forward are kept
+        for df_flat in self._iter_flat_ticks(self._iter_daily_quotes(expirations)):
+            df_0dte = df_flat[df_flat["date"] == df_flat["expiration"]]
+            if df_0dte.empty:
+                continue
+            chain = ChainSnapshot.from_ticks(df_0dte)
+            record = self._atm_record(chain)
+            if record is None:
+                continue
+            records.append(record)
+            day_frames.append(chain.to_frame(chain.nearest(record["forward"], 2 * self.n_wings + 1)))
+
+        # e.g. a pre-open run where today's expiration has no auction-window quotes yet: nothing to write
+        if not records:
+            print("No auction quotes in the fetched expirations")
+            return self._persisted_daily_quotes(), pd.DataFrame()
+
+        df_daily_quotes = self._find_atm_quotes(records, incremental)
+        df_intraday = self._save_intraday_quotes(day_frames, incremental)
         return df_daily_quotes, df_intraday
@@ -1,64 +1,88 @@
 import pandas as pd
 import numpy as np
 from pathlib import Path
+from typing import Optional
+from ESBarStore import ESBarStore
+from Instrumentation import instrumented, record_io
+from ResultCache import ResultCache
 
 class AuctionVolPreprocessor:
-    def __init__(self, data_path="data"):
+    def __init__(self, data_path="data", cache: Optional[ResultCache] = None):
         self.data_path = Path(data_path)
-        self.futures_file = self.data_path / "es_futures_1m_all.csv"
+        self.cache = cache
+        self.es_store = ESBarStore(self.data_path)
         self.spx_file = self.data_path / "spx_spot_daily.csv"
         self.atm_file = self.data_path / "atm_strike_map.csv"
         self.quotes_file = self.data_path / "auction_daily_quotes.parquet"
 
+    @instrumented()
     def _load_and_align_timezones(self):
         print("Loading and aligning timezones...")
 
-        es_futures = pd.read_csv(self.futures_file, index_col=0, parse_dates=True)
-        es_futures.index = pd.to_datetime(es_futures.index).tz_localize("UTC").tz_convert("America/New_York")
+        es_futures = self.es_store.load()
 
         spx_spot = pd.read_csv(self.spx_file, parse_dates=["date"])
-        spx_spot["date"] = pd.to_datetime(spx_spot["date"]).dt.tz_localize("UTC").dt.tz_convert("America/New_York")
+        spx_spot["date"] = pd.to_datetime(spx_spot["date"], utc=True).dt.tz_convert("America/New_York")
 
         atm_strike_map = pd.read_csv(self.atm_file, parse_dates=["date"])
-        atm_strike_map["date"] = pd.to_datetime(atm_strike_map["date"]).dt.tz_localize("UTC").dt.tz_convert("America/New_York")
+        atm_strike_map["date"] = pd.to_datetime(atm_strike_map["date"], utc=True).dt.tz_convert("America/New_York")
 
         auction_quotes = pd.read_parquet(self.quotes_file)
-        auction_quotes["date"] = pd.to_datetime(auction_quotes["date"]).dt.tz_localize("UTC").dt.tz_convert("America/New_York")
+        auction_quotes["date"] = pd.to_datetime(auction_quotes["date"], utc=True).dt.tz_convert("America/New_York")
 
+        record_io(read=self.spx_file)
+        record_io(read=self.atm_file)
+        record_io(read=self.quotes_file)
         return es_futures, spx_spot, atm_strike_map, auction_quotes
 
+    @instrumented(rows_in=lambda self, es_futures, *args: len(es_futures))
     def compute_overnight_realized_vol(self, es_futures, spx_spot, auction_quotes):
         print("Computing overnight realized volatility...")
-        results = []
+        auction_days = pd.DatetimeIndex(auction_quotes["date"])
 
-        for auction_day in auction_quotes["date"]:
-            auction_day = pd.Timestamp(auction_day)
-            t_minus_1 = auction_day - pd.Timedelta(days=1)
+        # as-of lookup of the prior SPX close: last spot row strictly before each auction timestamp
+        spx_sorted = spx_spot.sort_values("date")
+        prior = pd.DatetimeIndex(spx_sorted["date"]).searchsorted(auction_days, side="left") - 1
+        spx_close = np.where(prior >= 0, spx_sorted["Close"].to_numpy()[np.maximum(prior, 0)], np.nan)
 
-            spx_before = spx_spot[spx_spot["date"] < auction_day]
-            spx_close_t_minus_1 = spx_before.iloc[-1]["Close"] if not spx_before.empty else None
+        es_start = ESBarStore.wall_times(auction_days, "18:00", "America/New_York", days=-1)
+        es_end = ESBarStore.wall_times(auction_days, "09:30", "America/New_York")
+        lo, hi = ESBarStore.window_offsets(es_futures.index, es_start, es_end)
 
-            t1_str = t_minus_1.strftime("%Y-%m-%d")
-            t_str = auction_day.strftime("%Y-%m-%d")
-            es_start = pd.Timestamp(f"{t1_str} 18:00", tz="America/New_York")
-            es_end = pd.Timestamp(f"{t_str} 09:30", tz="America/New_York")
+        # returns inside window [lo, hi) are r[lo + 1:hi]; prefix sums give every window's count, sum and sum of squares
+        close = es_futures["Close"].to_numpy(dtype=np.float64)
+        r = np.log(close[1:] / close[:-1])
+        valid = np.isfinite(r)
+        r = np.where(valid, r, 0.0)
+        prefix = lambda x: np.concatenate([[0.0, 0.0], np.cumsum(x)])
+        n_cs, s1_cs, s2_cs = prefix(valid), prefix(r), prefix(r * r)
+        first = np.minimum(lo + 1, hi)
 
-            es_window = es_futures.loc[(es_futures.index >= es_start) & (es_futures.index <= es_end)]
-            log_returns = np.log(es_window["Close"] / es_window["Close"].shift(1)).dropna()
-            realized_std = log_returns.std() * np.sqrt(len(log_returns))
+        n = n_cs[hi] - n_cs[first]
+        s1 = s1_cs[hi] - s1_cs[first]
+        s2 = s2_cs[hi] - s2_cs[first]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            var = np.where(n > 1, (s2 - s1 * s1 / n) / (n - 1), np.nan)
+        realized_std = np.sqrt(np.maximum(var, 0.0)) * np.sqrt(n)
 
-            results.append({
-                "date": auction_day,
-                "spx_close_t_minus_1": spx_close_t_minus_1,
-                "realized_std": realized_std,
-                "n_ticks": len(log_returns)
-            })
-
-        overnight_df = pd.DataFrame(results)
+        overnight_df = pd.DataFrame({
+            "date": auction_days,
+            "spx_close_t_minus_1": spx_close,
+            "realized_std": realized_std,
+            "n_ticks": n.astype(int),
+        })
         overnight_df.to_csv(self.data_path / "overnight_realized_vol.csv", index=False)
+        record_io(written=self.data_path / "overnight_realized_vol.csv")
         return overnight_df
 
-    def run(self):
+    def _run(self):
         es_futures, spx_spot, atm_strike_map, auction_quotes = self._load_and_align_timezones()
         overnight_df = self.compute_overnight_realized_vol(es_futures, spx_spot, auction_quotes)
         return overnight_df
+
+    @instrumented()
+    def run(self):
+        if self.cache is None:
+            return self._run()
+        input_files = [self.es_store.fingerprint_file(), self.spx_file, self.atm_file, self.quotes_file]
+        return self.cache.memoize("overnight_realized_vol", self._run, input_files=input_files)
@@ -0,0 +1,115 @@
+import numpy as np
+import pandas as pd
+from scipy.special import ndtr
+from typing import Dict, Optional
+
+STRIKE_SCALE = 1000
+SESSION_CLOSE_MS = 16 * 60 * 60_000
+_INV_SQRT_2PI = 1 / np.sqrt(2 * np.pi)
+
+class BlackScholesPricer:
+    def __init__(self, r=0.0, q=0.0, vol_bounds=(1e-6, 5.0), tol=1e-10, max_iter=100):
+        self.r = r
+        self.q = q
+        self.vol_lo, self.vol_hi = vol_bounds
+        self.tol = tol
+        self.max_iter = max_iter
+
+    def _is_call(self, right) -> np.ndarray:
+        right = np.asarray(right)
+        if right.dtype.kind in "US" or right.dtype == object:
+            right = np.char.upper(right.astype(str)) == "C"
+        return right.astype(bool)
+
+    def _d1_d2(self, S, K, T, sigma):
+        sqrt_t = np.sqrt(T)
+        d1 = (np.log(S / K) + (self.r - self.q + 0.5 * sigma**2) * T) / (sigma * sqrt_t)
+        return d1, d1 - sigma * sqrt_t
+
+    def _vega(self, S, K, T, sigma):
+        d1, _ = self._d1_d2(S, K, T, sigma)
+        return S * np.exp(-self.q * T) * np.exp(-0.5 * d1**2) * _INV_SQRT_2PI * np.sqrt(T)
+
+    def price(self, S, K, T, sigma, right="C") -> np.ndarray:
+        S, K, T, sigma, is_call = np.broadcast_arrays(*(np.asarray(x, dtype=np.float64) for x in (S, K, T, sigma)), self._is_call(right))
+        d1, d2 = self._d1_d2(S, K, T, sigma)
+        fwd = S * np.exp(-self.q * T)
+        disc_k = K * np.exp(-self.r * T)
+        call = fwd * ndtr(d1) - disc_k * ndtr(d2)
+        put = disc_k * ndtr(-d2) - fwd * ndtr(-d1)
+        return np.where(is_call, call, put)
+
+    def greeks(self, S, K, T, sigma, right="C") -> Dict[str, np.ndarray]:
+        S, K, T, sigma, is_call = np.broadcast_arrays(*(np.asarray(x, dtype=np.float64) for x in (S, K, T, sigma)), self._is_call(right))
+        d1, d2 = self._d1_d2(S, K, T, sigma)
+        sqrt_t = np.sqrt(T)
+        div = np.exp(-self.q * T)
+        disc = np.exp(-self.r * T)
+        pdf = np.exp(-0.5 * d1**2) * _INV_SQRT_2PI
+
+        delta = np.where(is_call, div * ndtr(d1), -div * ndtr(-d1))
+        gamma = div * pdf / (S * sigma * sqrt_t)
+        vega = S * div * pdf * sqrt_t
+        theta_common = -S * div * pdf * sigma / (2 * sqrt_t)
+        theta = np.where(
+            is_call,
+            theta_common - self.r * K * disc * ndtr(d2) + self.q * S * div * ndtr(d1),
+            theta_common + self.r * K * disc * ndtr(-d2) - self.q * S * div * ndtr(-d1),
+        )
+        rho = np.where(is_call, K * T * disc * ndtr(d2), -K * T * disc * ndtr(-d2))
+        return {"delta": delta, "gamma": gamma, "vega": vega, "theta": theta, "rho": rho}
+
+    def implied_vol(self, price, S, K, T, right="C") -> np.ndarray:
+        price, S, K, T, is_call = np.broadcast_arrays(*(np.asarray(x, dtype=np.float64) for x in (price, S, K, T)), self._is_call(right))
+        fwd = S * np.exp(-self.q * T)
+        disc_k = K * np.exp(-self.r * T)
+
+        # prices outside the no-arbitrage bounds have no implied vol
+        intrinsic = np.where(is_call, np.maximum(fwd - disc_k, 0), np.maximum(disc_k - fwd, 0))
+        upper = np.where(is_call, fwd, disc_k)
+        valid = (T > 0) & (price > intrinsic) & (price < upper) & np.isfinite(price)
+
+        lo = np.full(price.shape, self.vol_lo)
+        hi = np.full(price.shape, self.vol_hi)
+        # Brenner-Subrahmanyam start on the time value, clipped into the bracket
+        with np.errstate(divide="ignore", invalid="ignore"):
+            sigma = np.sqrt(2 * np.pi / T) * (price - intrinsic) / S
+        sigma = np.clip(np.where(np.isfinite(sigma), sigma, 0.2), self.vol_lo, self.vol_hi)
+
+        active = valid.copy()
+        for _ in range(self.max_iter):
+            if not active.any():
+                break
+            idx = np.nonzero(active)
+            s = sigma[idx]
+            args = (S[idx], K[idx], T[idx], s, is_call[idx])
+            diff = self.price(*args) - price[idx]
+            vega = self._vega(*args[:4])
+
+            # keep a bracket around the root so non-converging Newton steps fall back to bisection
+            too_high = diff > 0
+            hi[idx] = np.where(too_high, s, hi[idx])
+            lo[idx] = np.where(too_high, lo[idx], s)
+
+            # a vanishing vega can overflow the step as well as divide by zero; the bracket check discards either
+            with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+                newton = s - diff / vega
+            in_bracket = (newton > lo[idx]) & (newton < hi[idx]) & np.isfinite(newton)
+            s_next = np.where(in_bracket, newton, 0.5 * (lo[idx] + hi[idx]))
+
+            priced = np.abs(diff) < self.tol * np.maximum(price[idx], 1.0)
+            sigma[idx] = np.where(priced, s, s_next)
+            active[idx] = ~(priced | (np.abs(s_next - s) < self.tol))
+
+        return np.where(valid, sigma, np.nan)
+
+    def quote_implied_vols(self, quotes: pd.DataFrame, S, T, price_col="mid_px", right_col="right",
+                           strike_col="strike", right: Optional[str] = None) -> np.ndarray:
+        K = quotes[strike_col].to_numpy(dtype=np.float64) / STRIKE_SCALE
+        rights = right if right is not None else quotes[right_col].astype(str).to_numpy()
+        return self.implied_vol(quotes[price_col].to_numpy(dtype=np.float64), S, K, T, rights)
+
+    @staticmethod
+    def time_to_close(timestamp_ms, close_ms=SESSION_CLOSE_MS, minutes_per_unit=390):
+        # remaining session time in the forecaster's units (dt = 1/390 per minute)
+        return np.maximum(close_ms - np.asarray(timestamp_ms, dtype=np.float64), 0) / 60_000 / minutes_per_unit
@@ -0,0 +1,129 @@
+import numpy as np
+import pandas as pd
+from typing import Optional
+from BlackScholesPricer import STRIKE_SCALE
+
+RIGHTS = ["C", "P"]
+
+
+class ChainSnapshot:
+    def __init__(self, date, strikes: np.ndarray, times: np.ndarray, bid: np.ndarray, ask: np.ndarray,
+                 bid_sz: Optional[np.ndarray] = None, ask_sz: Optional[np.ndarray] = None):
+        # bid/ask are dense (strike, right, time) arrays over sorted strikes and ms-of-day times; NaN where unquoted
+        self.date = pd.Timestamp(date)
+        self.strikes = strikes
+        self.times = times
+        self.bid = bid
+        self.ask = ask
+        self.bid_sz = bid_sz
+        self.ask_sz = ask_sz
+        self.K = strikes / STRIKE_SCALE
+
+    @classmethod
+    def from_ticks(cls, df_flat: pd.DataFrame, date=None) -> "ChainSnapshot":
+        # one expiration's flattened ticks; a repeated (strike, right, timestamp) keeps its last quote
+        strikes, k_idx = np.unique(df_flat["strike"].to_numpy(), return_inverse=True)
+        times, t_idx = np.unique(df_flat["timestamp"].to_numpy(), return_inverse=True)
+        r_idx = (np.asarray(df_flat["right"]) == "P").astype(np.int8)
+
+        shape = (len(strikes), 2, len(times))
+        arrays = dict.fromkeys(["bid_sz", "ask_sz"])
+        for col, dtype, fill in [("bid_px", np.float32, np.nan), ("ask_px", np.float32, np.nan),
+                                 ("bid_sz", np.int32, 0), ("ask_sz", np.int32, 0)]:
+            if col in df_flat:
+                arrays[col] = np.full(shape, fill, dtype=dtype)
+                arrays[col][k_idx, r_idx, t_idx] = df_flat[col].to_numpy()
+
+        if date is None:
+            date = df_flat["date"].iloc[0] if len(df_flat) else pd.NaT
+        return cls(date, strikes, times, arrays["bid_px"], arrays["ask_px"], arrays["bid_sz"], arrays["ask_sz"])
+
+    @property
+    def empty(self) -> bool:
+        return self.strikes.size == 0 or self.times.size == 0
+
+    def time_index(self, t_ms: int) -> int:
+        # as-of: the last snapshot time at or before t_ms
+        return int(np.searchsorted(self.times, t_ms, side="right")) - 1
+
+    def mid(self, t_ms: int) -> np.ndarray:
+        i = self.time_index(t_ms)
+        if i < 0:
+            return np.full((len(self.strikes), 2), np.nan)
+        mid = 0.5 * (self.bid[:, :, i].astype(np.float64) + self.ask[:, :, i])
+        return np.where(mid > 0, mid, np.nan)
+
+    def forward(self, t_ms: int) -> float:
+        # C - P falls monotonically in K, so the parity forward sits where it changes sign: a binary search
+        # over the strikes quoted on both sides, averaged over the two bracketing strikes
+        mid = self.mid(t_ms)
+        quoted = np.isfinite(mid).all(axis=1)
+        if not quoted.any():
+            return np.nan
+        K = self.K[quoted]
+        call_minus_put = mid[quoted, 0] - mid[quoted, 1]
+        i = np.searchsorted(-call_minus_put, 0.0)
+        bracket = slice(max(i - 1, 0), min(i + 1, len(K)))
+        return float(np.mean(K[bracket] + call_minus_put[bracket]))
+
+    def nearest(self, forward: float, n=1) -> np.ndarray:
+        # the n strikes closest to the forward, ascending: binary search, then walk outwards
+        n = min(n, len(self.K))
+        right = int(np.searchsorted(self.K, forward))
+        left = right - 1
+        picked = []
+        while len(picked) < n:
+            if right >= len(self.K) or (left >= 0 and forward - self.K[left] <= self.K[right] - forward):
+                picked.append(left)
+                left -= 1
+            else:
+                picked.append(right)
+                right += 1
+        return np.sort(np.array(picked, dtype=np.int64))
+
+    def atm(self, t_ms: int, forward: Optional[float] = None) -> Optional[int]:
+        # nearest strike to the forward with both sides quoted; the forward defaults to put-call parity, or pass ES
+        forward = self.forward(t_ms) if forward is None else forward
+        if not np.isfinite(forward):
+            return None
+        quoted = np.nonzero(np.isfinite(self.mid(t_ms)).all(axis=1))[0]
+        if quoted.size == 0:
+            return None
+        j = np.searchsorted(self.K[quoted], forward)
+        candidates = quoted[max(j - 1, 0):j + 1]
+        return int(candidates[np.argmin(np.abs(self.K[candidates] - forward))])
+
+    def wings(self, t_ms: int, n_wings=10, forward: Optional[float] = None) -> pd.DataFrame:
+        # 2 * n_wings + 1 strikes around the forward, with call/put quotes and log-moneyness, for skew
+        forward = self.forward(t_ms) if forward is None else forward
+        columns = ["strike", "log_moneyness", "call_bid", "call_ask", "call_mid", "put_bid", "put_ask", "put_mid"]
+        i = self.time_index(t_ms)
+        if not np.isfinite(forward) or i < 0:
+            return pd.DataFrame(columns=columns)
+        idx = self.nearest(forward, 2 * n_wings + 1)
+        mid = self.mid(t_ms)[idx]
+        return pd.DataFrame({
+            "strike": self.strikes[idx],
+            "log_moneyness": np.log(self.K[idx] / forward),
+            "call_bid": self.bid[idx, 0, i], "call_ask": self.ask[idx, 0, i], "call_mid": mid[:, 0],
+            "put_bid": self.bid[idx, 1, i], "put_ask": self.ask[idx, 1, i], "put_mid": mid[:, 1],
+        }, columns=columns)
+
+    def to_frame(self, strike_idx: Optional[np.ndarray] = None) -> pd.DataFrame:
+        # back to the long tick layout (one row per quoted strike/right/time), sorted by strike, right, time
+        strike_idx = np.arange(len(self.strikes)) if strike_idx is None else np.asarray(strike_idx)
+        bid = self.bid[strike_idx]
+        k, r, t = np.nonzero(np.isfinite(bid) | np.isfinite(self.ask[strike_idx]))
+        k = strike_idx[k]
+        frame = {
+            "timestamp": self.times[t],
+            "bid_sz": self.bid_sz[k, r, t] if self.bid_sz is not None else np.zeros(len(t), dtype=np.int32),
+            "bid_px": self.bid[k, r, t],
+            "ask_sz": self.ask_sz[k, r, t] if self.ask_sz is not None else np.zeros(len(t), dtype=np.int32),
+            "ask_px": self.ask[k, r, t],
+            "strike": self.strikes[k],
+            "right": pd.Categorical.from_codes(r.astype(np.int8), categories=RIGHTS),
+            "expiration": np.full(len(t), np.datetime64(self.date, "ns")),
+            "date": np.full(len(t), np.datetime64(self.date, "ns")),
+        }
+        return pd.DataFrame(frame)
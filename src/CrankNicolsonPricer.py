@@ -0,0 +1,101 @@
+import numpy as np
+from scipy.interpolate import CubicSpline
+from scipy.linalg import lapack
+from typing import Optional, Tuple
+
+class CrankNicolsonPricer:
+    def __init__(self, M=400, N=100, r=0.0, width=8.0, max_factors=16):
+        self.M = M
+        self.N = N
+        self.r = r
+        self.width = width
+        self.max_factors = max_factors
+        self._factors = {}
+
+    def _grid(self, K_ref: float, T: float, sigmas: np.ndarray) -> np.ndarray:
+        # span +/- width standard deviations of the widest vol in the batch, so all sigmas share one grid
+        half_width = self.width * sigmas.max() * np.sqrt(T)
+        return np.linspace(K_ref * np.exp(-half_width), K_ref * np.exp(half_width), self.M + 1)
+
+    def _coefficients(self, S_vals: np.ndarray, sigmas: np.ndarray, dt: float):
+        dS = S_vals[1] - S_vals[0]
+        x = S_vals[1:-1] / dS
+        diffusion = 0.25 * dt * sigmas[:, None] ** 2 * x**2
+        drift = 0.25 * dt * self.r * x
+        return diffusion - drift, -2 * diffusion - 0.5 * dt * self.r, diffusion + drift
+
+    def _factor(self, S_vals: np.ndarray, sigmas: np.ndarray, dt: float):
+        key = (sigmas.tobytes(), dt, S_vals[0], S_vals[-1], self.M, self.r)
+        if key not in self._factors:
+            if len(self._factors) >= self.max_factors:
+                self._factors.pop(next(iter(self._factors)))
+            lower, diag, upper = self._coefficients(S_vals, sigmas, dt)
+
+            # the sigma batch is one block-tridiagonal system (blocks decoupled at their edges), LU-factored once
+            lower, upper = -lower, -upper
+            lower[:, 0] = 0.0
+            upper[:, -1] = 0.0
+            factor = lapack.dgttrf(lower.ravel()[1:], 1 - diag.ravel(), upper.ravel()[:-1])
+            if factor[-1] != 0:
+                raise ValueError(f"Crank-Nicolson factorization failed (info={factor[-1]})")
+            self._factors[key] = factor[:-1]
+        return self._factors[key]
+
+    def _boundaries(self, S_lo: float, S_hi: float, K: float, is_call: bool, tau: float) -> Tuple[float, float]:
+        disc_k = K * np.exp(-self.r * tau)
+        if is_call:
+            return 0.0, max(S_hi - disc_k, 0.0)
+        return max(disc_k - S_lo, 0.0), 0.0
+
+    def solve(self, K_ref: float, T: float, sigma, right="C") -> Tuple[np.ndarray, np.ndarray]:
+        sigmas = np.atleast_1d(np.asarray(sigma, dtype=np.float64))
+        is_call = str(right).upper() == "C"
+        dt = T / self.N
+
+        S_vals = self._grid(K_ref, T, sigmas)
+        factor = self._factor(S_vals, sigmas, dt)
+        lower, diag, upper = self._coefficients(S_vals, sigmas, dt)
+
+        # only the current interior slice (n_sigma, M - 1) is kept while stepping from the payoff to tau = T
+        interior = S_vals[1:-1]
+        V = np.tile(np.maximum(interior - K_ref, 0.0) if is_call else np.maximum(K_ref - interior, 0.0), (len(sigmas), 1))
+        low, high = self._boundaries(S_vals[0], S_vals[-1], K_ref, is_call, 0.0)
+
+        for n in range(self.N):
+            rhs = (1 + diag) * V
+            rhs[:, 1:] += lower[:, 1:] * V[:, :-1]
+            rhs[:, :-1] += upper[:, :-1] * V[:, 1:]
+
+            next_low, next_high = self._boundaries(S_vals[0], S_vals[-1], K_ref, is_call, (n + 1) * dt)
+            rhs[:, 0] += lower[:, 0] * (low + next_low)
+            rhs[:, -1] += upper[:, -1] * (high + next_high)
+            low, high = next_low, next_high
+
+            V, info = lapack.dgttrs(*factor, rhs.ravel())
+            V = V.reshape(rhs.shape)
+
+        grid = np.empty((len(sigmas), self.M + 1))
+        grid[:, 0], grid[:, 1:-1], grid[:, -1] = low, V, high
+        return S_vals, grid
+
+    def price(self, S0: float, K, T: float, sigma, right="C", spots: Optional[np.ndarray] = None) -> np.ndarray:
+        # prices are homogeneous in (S, K): V(S, K) = (K / S0) * V(S * S0 / K, S0), so one solve at K = S0 prices every strike
+        K = np.atleast_1d(np.asarray(K, dtype=np.float64))
+        spots = np.asarray(S0 if spots is None else spots, dtype=np.float64)
+        rights = np.broadcast_to(np.char.upper(np.asarray(right).astype(str)), K.shape)
+
+        scale = K / S0
+        x = spots[..., None] / scale
+        n_sigma = np.atleast_1d(sigma).shape[0]
+        prices = np.empty((n_sigma,) + x.shape)
+        for side in np.unique(rights):
+            S_vals, grid = self.solve(S0, T, sigma, side)
+            cols = rights == side
+            x_side = x[..., cols]
+            inside = np.clip(x_side, S_vals[0], S_vals[-1])
+            # beyond the grid the value continues along the Dirichlet boundary with slope +/-1
+            overhang = np.maximum(x_side - S_vals[-1], 0.0) if side == "C" else np.maximum(S_vals[0] - x_side, 0.0)
+            prices[..., cols] = (CubicSpline(S_vals, grid, axis=1)(inside) + overhang) * scale[cols]
+
+        # (n_sigma, n_strikes) at S0, or (n_sigma, n_strikes, n_spots) when spots are given
+        return prices if prices.ndim == 2 else np.moveaxis(prices, 1, -1)
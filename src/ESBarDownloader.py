@@ -0,0 +1,143 @@
+import contextvars
+import threading
+import time
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Optional, Tuple
+from ESBarStore import BAR_COLUMNS, ESBarStore
+from Instrumentation import instrumented, record_http
+
+try:
+    import exchange_calendars as xcals
+except ImportError:
+    xcals = None
+
+
+def trading_days(start, end, calendar="CMES") -> pd.DatetimeIndex:
+    # sessions of the exchange calendar when exchange_calendars is installed; plain weekdays otherwise, where a
+    # holiday only costs a window that comes back empty
+    start = pd.Timestamp(start).normalize()
+    end = pd.Timestamp(end).normalize()
+    if xcals is None:
+        return pd.bdate_range(start, end)
+    cal = xcals.get_calendar(calendar)
+    start = max(start, cal.first_session)
+    end = min(end, cal.last_session)
+    if start > end:
+        return pd.DatetimeIndex([])
+    return pd.DatetimeIndex(cal.sessions_in_range(start, end))
+
+
+def plan_windows(days, max_days=7) -> List[Tuple[pd.Timestamp, pd.Timestamp]]:
+    # maximal [start, end) date windows spanning at most max_days calendar days, tiling the trading days without
+    # overlap. A window opens the evening before its first day so the Globex session that trades into it is
+    # included, and never before the previous window closed
+    one_day = pd.Timedelta(days=1)
+    windows = []
+    for day in pd.DatetimeIndex(days).sort_values():
+        if windows and day + one_day - windows[-1][0] <= pd.Timedelta(days=max_days):
+            windows[-1][1] = day + one_day
+        else:
+            start = day - one_day if not windows else max(windows[-1][1], day - one_day)
+            windows.append([start, day + one_day])
+    return [(start, end) for start, end in windows]
+
+
+class RateLimiter:
+    # spaces calls at least per / rate seconds apart across threads
+    def __init__(self, rate=2.0, per=1.0):
+        self.interval = per / rate
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class RecordedBarProvider:
+    # serves windows out of bars recorded earlier (a DataFrame or a CSV in the es_futures_1m_all.csv layout), so
+    # the downloader runs offline; requests keeps every window asked for
+    def __init__(self, bars, timezone="America/New_York"):
+        if not isinstance(bars, pd.DataFrame):
+            csv_file = Path(bars)
+            bars = ESBarStore(csv_file.parent, csv_name=csv_file.name, timezone=timezone)._read_csv()
+        self.bars = bars.sort_index()
+        self.timezone = timezone
+        self.requests = []
+
+    def fetch(self, start, end) -> pd.DataFrame:
+        self.requests.append((start, end))
+        start = pd.Timestamp(start).tz_localize(self.timezone)
+        end = pd.Timestamp(end).tz_localize(self.timezone)
+        index = self.bars.index.tz_convert(self.timezone)
+        return self.bars[(index >= start) & (index < end)]
+
+
+class ESBarDownloader:
+    def __init__(self, provider, store: ESBarStore, calendar="CMES", max_days=7, max_workers=4, rate=2.0, per=1.0,
+                 retries=3, backoff=1.0):
+        self.provider = provider
+        self.store = store
+        self.calendar = calendar
+        self.max_days = max_days
+        self.max_workers = max_workers
+        self.limiter = RateLimiter(rate, per)
+        self.retries = retries
+        self.backoff = backoff
+
+    def plan(self, start, end, incremental=True) -> List[Tuple[pd.Timestamp, pd.Timestamp]]:
+        # incremental runs resume from the day of the last stored bar; its repeats are dropped on append
+        start = pd.Timestamp(start)
+        if incremental:
+            last = self.store.last_timestamp()
+            if last is not None:
+                start = max(start, last.tz_localize(None).normalize())
+        return plan_windows(trading_days(start, end, self.calendar), self.max_days)
+
+    def _fetch_window(self, window) -> Optional[pd.DataFrame]:
+        # None once the retries are spent, which download() tells apart from a window that has no bars
+        start, end = window
+        endpoint = type(self.provider).__name__
+        for attempt in range(self.retries + 1):
+            self.limiter.wait()
+            t0 = time.perf_counter()
+            try:
+                bars = self.provider.fetch(start, end)
+                record_http(endpoint, time.perf_counter() - t0)
+                return bars
+            except Exception as e:
+                record_http(endpoint, time.perf_counter() - t0, status=599)
+                if attempt == self.retries:
+                    print(f"Error on {start.date()} → {end.date()}: {e}")
+                    return None
+                time.sleep(self.backoff * 2 ** attempt)
+
+    @instrumented()
+    def download(self, start, end, incremental=True) -> pd.DataFrame:
+        windows = self.plan(start, end, incremental)
+        print(f"Fetching {len(windows)} windows of up to {self.max_days} days...")
+
+        # each window runs in a copy of the caller's context so its fetch time is attributed to this stage
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = [pool.submit(contextvars.copy_context().run, self._fetch_window, w) for w in windows]
+            frames = [f.result() for f in futures]
+
+        # only the windows before the first failure are stored: incremental runs resume from the last stored bar,
+        # so anything appended past a failed window would leave a hole no later run fills
+        failed = next((i for i, f in enumerate(frames) if f is None), None)
+        if failed is not None:
+            print(f"Stopping at the failed window from {windows[failed][0].date()}; the next run resumes there")
+            frames = frames[:failed]
+        frames = [f[BAR_COLUMNS] for f in frames if not f.empty]
+        if not frames:
+            return pd.DataFrame(columns=BAR_COLUMNS)
+        bars = pd.concat(frames)
+        bars.index = pd.DatetimeIndex(bars.index, name="Datetime").tz_convert(self.store.timezone)
+        bars = bars[~bars.index.duplicated(keep="last")].sort_index()
+        return self.store.append(bars)
@@ -0,0 +1,227 @@
+import os
+import shutil
+import uuid
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from pathlib import Path
+from typing import Optional, Sequence
+from Instrumentation import instrumented, record_io, stage
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+BAR_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+
+
+class ESBarStore:
+    _cache = {}
+
+    def __init__(self, data_path="data", csv_name="es_futures_1m_all.csv", store_name="es_bars", timezone="America/New_York"):
+        self.data_path = Path(data_path)
+        self.csv_file = self.data_path / csv_name
+        self.store_path = self.data_path / store_name
+        self.timezone = timezone
+
+    def _read_csv(self) -> pd.DataFrame:
+        record_io(read=self.csv_file)
+        df = pd.read_csv(self.csv_file, usecols=["Datetime"] + BAR_COLUMNS)
+        # yfinance writes offset-aware strings that straddle DST; parse through UTC so every row lands on one zone
+        df["Datetime"] = pd.to_datetime(df["Datetime"], utc=True).dt.tz_convert(self.timezone)
+        return df.drop_duplicates("Datetime", keep="last").set_index("Datetime").sort_index()
+
+    @property
+    def version_file(self) -> Path:
+        # pyarrow datasets skip "_"-prefixed files, so the stamp sits inside the store without being read as bars
+        return self.store_path / "_version"
+
+    def _stamp(self, store_path: Optional[Path] = None):
+        (store_path or self.store_path).joinpath("_version").write_text(uuid.uuid4().hex)
+
+    def fingerprint_file(self) -> Path:
+        # a token rewritten by every write and append; ResultCache keys on it instead of hashing the bars
+        self.build()
+        if not self.version_file.exists():
+            self._stamp()
+        return self.version_file
+
+    def _is_stale(self) -> bool:
+        if not self.store_path.exists():
+            return True
+        return self.csv_file.exists() and self.csv_file.stat().st_mtime_ns > self.store_path.stat().st_mtime_ns
+
+    @contextmanager
+    def _locked(self):
+        # serializes writers across processes (a no-op where fcntl is missing); readers never take it
+        if fcntl is None:
+            yield
+            return
+        self.data_path.mkdir(parents=True, exist_ok=True)
+        with open(self.store_path.with_name(f".{self.store_path.name}.lock"), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    @instrumented()
+    def write(self, df: pd.DataFrame):
+        with self._locked():
+            self._write(df)
+
+    def _write(self, df: pd.DataFrame):
+        # builds the store in a directory private to this writer and swaps it in whole; callers hold the lock
+        df = df[BAR_COLUMNS].sort_index()
+        table = pa.Table.from_pandas(df.assign(month=df.index.strftime("%Y-%m")).reset_index(), preserve_index=False)
+
+        token = uuid.uuid4().hex
+        tmp_path = self.store_path.with_name(f".{self.store_path.name}.{token}.tmp")
+        old_path = self.store_path.with_name(f".{self.store_path.name}.{token}.old")
+        # one file per month under a fixed name, so append() can replace a month with a single os.replace
+        pq.write_to_dataset(table, tmp_path, partition_cols=["month"], basename_template="part-{i}.parquet")
+        self._stamp(tmp_path)
+
+        try:
+            os.replace(self.store_path, old_path)
+        except FileNotFoundError:
+            pass
+        try:
+            os.replace(tmp_path, self.store_path)
+        except OSError:
+            # another writer swapped its store in between the two renames; the store is complete either way
+            shutil.rmtree(tmp_path, ignore_errors=True)
+        shutil.rmtree(old_path, ignore_errors=True)
+        record_io(written=self.store_path)
+
+    @instrumented()
+    def append(self, df: pd.DataFrame) -> pd.DataFrame:
+        # merges bars into the store, rewriting only the month partitions they touch; bars whose timestamp is
+        # already stored are dropped, and the bars that were actually new are returned
+        if self.csv_file.exists():
+            self.build()
+        df = df[BAR_COLUMNS]
+        df = df.set_axis(df.index.tz_convert(self.timezone))
+        df = df[~df.index.duplicated(keep="last")].sort_index()
+        if df.empty:
+            return df
+
+        with self._locked():
+            if not self.store_path.exists():
+                self._write(df)
+                return df
+
+            months = sorted(set(df.index.strftime("%Y-%m")))
+            dataset = ds.dataset(self.store_path, format="parquet", partitioning="hive")
+            existing = dataset.to_table(columns=["Datetime"] + BAR_COLUMNS, filter=ds.field("month").isin(months))
+            record_io(read=existing.nbytes)
+            existing = existing.to_pandas().set_index("Datetime")
+            existing.index = existing.index.tz_convert(self.timezone)
+
+            new = df[~df.index.isin(existing.index)]
+            if new.empty:
+                return new
+            merged = pd.concat([existing, new]).sort_index()
+            touched = set(new.index.strftime("%Y-%m"))
+            for month, bars in merged.groupby(merged.index.strftime("%Y-%m")):
+                if month in touched:
+                    self._replace_month(month, bars)
+            self._stamp()
+            # load() keys its cache on the store directory's mtime, which a rewrite inside a month does not bump
+            os.utime(self.store_path)
+            return new
+
+    def _replace_month(self, month: str, bars: pd.DataFrame):
+        # the month's bars go to a hidden file (datasets skip "."-prefixed names) that os.replace swaps in, so a
+        # reader in another process sees either the old month or the new one, never a missing or partial one
+        month_path = self.store_path / f"month={month}"
+        month_path.mkdir(exist_ok=True)
+        target = month_path / "part-0.parquet"
+        tmp_path = month_path / f".{target.name}.{uuid.uuid4().hex}.tmp"
+        pq.write_table(pa.Table.from_pandas(bars.reset_index(), preserve_index=False), tmp_path)
+        os.replace(tmp_path, target)
+        # stores written before the fixed file name keep their month under other names
+        for path in month_path.glob("*.parquet"):
+            if path != target:
+                path.unlink(missing_ok=True)
+        record_io(written=target)
+
+    def last_timestamp(self) -> Optional[pd.Timestamp]:
+        if not self.store_path.exists() and not self.csv_file.exists():
+            return None
+        self.build()
+        dataset = ds.dataset(self.store_path, format="parquet", partitioning="hive")
+        months = sorted(p.name.split("=", 1)[1] for p in self.store_path.glob("month=*"))
+        if not months:
+            return None
+        latest = dataset.to_table(columns=["Datetime"], filter=ds.field("month") == months[-1]).column("Datetime")
+        return pd.Timestamp(pc.max(latest).as_py()).tz_convert(self.timezone)
+
+    def build(self, force=False):
+        if not (force or self._is_stale()):
+            return
+        with self._locked():
+            # another process may have rebuilt the store while this one waited for the lock
+            if force or self._is_stale():
+                print(f"Converting {self.csv_file.name} to {self.store_path.name}/...")
+                with stage("ESBarStore.build"):
+                    self._write(self._read_csv())
+
+    def load(self, start=None, end=None, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        self.build()
+        start = self._to_timestamp(start)
+        end = self._to_timestamp(end)
+        columns = list(columns) if columns is not None else BAR_COLUMNS
+
+        key = (str(self.store_path.resolve()), start, end, tuple(columns))
+        mtime = self.store_path.stat().st_mtime_ns
+        cached = self._cache.get(key)
+        if cached is not None and cached[0] == mtime:
+            return cached[1].copy(deep=False)
+
+        dataset = ds.dataset(self.store_path, format="parquet", partitioning="hive")
+        predicate = None
+        if start is not None:
+            predicate = (ds.field("month") >= start.strftime("%Y-%m")) & (ds.field("Datetime") >= start)
+        if end is not None:
+            upper = (ds.field("month") <= end.strftime("%Y-%m")) & (ds.field("Datetime") <= end)
+            predicate = upper if predicate is None else predicate & upper
+
+        table = dataset.to_table(columns=["Datetime"] + columns, filter=predicate)
+        record_io(read=table.nbytes)
+        df = table.to_pandas().set_index("Datetime").sort_index()
+        df.index = df.index.tz_convert(self.timezone)
+
+        self._cache[key] = (mtime, df)
+        return df.copy(deep=False)
+
+    def _to_timestamp(self, value) -> Optional[pd.Timestamp]:
+        if value is None:
+            return None
+        ts = pd.Timestamp(value)
+        return ts.tz_localize(self.timezone) if ts.tzinfo is None else ts.tz_convert(self.timezone)
+
+    @staticmethod
+    def window_offsets(index: pd.DatetimeIndex, starts, ends):
+        # [start, end] windows over a sorted index as (lo, hi) positional offsets, i.e. index[lo:hi]
+        lo = index.searchsorted(starts, side="left")
+        hi = index.searchsorted(ends, side="right")
+        return lo, np.maximum(lo, hi)
+
+    @staticmethod
+    def wall_times(dates, clock: str, timezone: str, days=0) -> pd.DatetimeIndex:
+        # local wall-clock time on each date, so windows keep their clock time across DST changes
+        local = pd.DatetimeIndex(dates)
+        if local.tz is not None:
+            local = local.tz_convert(timezone).tz_localize(None)
+        local = local.normalize() + pd.Timedelta(days=days) + pd.to_timedelta(f"{clock}:00")
+        return local.tz_localize(timezone)
+
+    @classmethod
+    def clear_cache(cls):
+        cls._cache.clear()
@@ -1,52 +1,67 @@
-import time
 import yfinance as yf
 import pandas as pd
-from datetime import datetime, timedelta
+from datetime import datetime
 from pathlib import Path
+from ESBarDownloader import ESBarDownloader
+from ESBarStore import BAR_COLUMNS, ESBarStore
+from Instrumentation import instrumented, record_io
+
+# the futures and cash index behind each option root; file names stay es_/spx_ so a root=<ROOT>/ directory
+# is a drop-in data_path for ESBarStore, AuctionVolPreprocessor and the forecasters
+UNDERLYINGS = {
+    "SPXW": {"futures_symbol": "ES=F", "spot_symbol": "^GSPC"},
+    "XSP": {"futures_symbol": "ES=F", "spot_symbol": "^XSP"},
+    "NDXP": {"futures_symbol": "NQ=F", "spot_symbol": "^NDX"},
+}
+
+class YFinanceBarProvider:
+    def __init__(self, symbol="ES=F", interval="1m"):
+        self.symbol = symbol
+        self.interval = interval
+
+    def fetch(self, start, end) -> pd.DataFrame:
+        # yfinance serves at most ~7 days of 1m bars per request, and only for the last 30 days
+        hist = yf.Ticker(self.symbol).history(start=start, end=end, interval=self.interval)
+        return hist[BAR_COLUMNS]
+
 
 class ESFuturesFetcher:
-    def __init__(self, start_date, end_date, save_path="data"):
+    def __init__(self, start_date, end_date, save_path="data", futures_symbol="ES=F", spot_symbol="^GSPC", provider=None):
         self.start_date = datetime.strptime(start_date, "%Y-%m-%d")
         self.end_date = datetime.strptime(end_date, "%Y-%m-%d")
         self.save_path = Path(save_path)
         self.save_path.mkdir(parents=True, exist_ok=True)
+        self.futures_symbol = futures_symbol
+        self.spot_symbol = spot_symbol
+        self.provider = provider if provider is not None else YFinanceBarProvider(futures_symbol)
+
+    @classmethod
+    def for_root(cls, root, start_date, end_date, save_path="data", provider=None):
+        return cls(start_date, end_date, Path(save_path) / f"root={root}", provider=provider, **UNDERLYINGS[root])
 
+    @instrumented()
     def fetch_spx_daily(self):
-        print("Fetching SPX daily spot data...")
-        spx = yf.Ticker("^GSPC")
+        print(f"Fetching {self.spot_symbol} daily spot data...")
+        spx = yf.Ticker(self.spot_symbol)
         spx_hist = spx.history(start=self.start_date, end=self.end_date, interval="1d")
         spx_hist = spx_hist[["Open", "Close", "High", "Low", "Volume"]].reset_index()
         spx_hist.rename(columns={"Date": "date"}, inplace=True)
         spx_hist.to_csv(self.save_path / "spx_spot_daily.csv", index=False)
+        record_io(written=self.save_path / "spx_spot_daily.csv")
         return spx_hist
 
-    def fetch_es_1min(self, sleep_time=1):
-        print("Fetching ES 1-minute futures data...")
-        current = self.start_date
-        all_data = []
-        es = yf.Ticker("ES=F")
-
-        while current <= self.end_date:
-            print(f"→ {current.date()}")
-
-            try:
-                hist = es.history(period="7d", interval="1m") 
-                filtered = hist[hist.index.date == current.date()]
-                if not filtered.empty:
-                    filtered = filtered.copy()
-                    filtered["date"] = current.date()
-                    all_data.append(filtered)
-            except Exception as e:
-                print(f"Error on {current.date()}: {e}")
-
-            current += timedelta(days=1)
-            time.sleep(sleep_time)
-
-        df_all = pd.concat(all_data)
-        df_all.to_csv(self.save_path / "es_futures_1m_all.csv")
-        print("Saved ES data to es_futures_1m_all.csv")
-        return df_all
+    @instrumented()
+    def fetch_es_1min(self, max_workers=4, rate=2.0, incremental=True):
+        # windows of consecutive trading days fetched concurrently and merged into the es_bars store; only bars
+        # not already stored are appended, and those are returned
+        print(f"Fetching {self.futures_symbol} 1-minute futures data...")
+        store = ESBarStore(self.save_path)
+        downloader = ESBarDownloader(self.provider, store, max_workers=max_workers, rate=rate)
+        new_bars = downloader.download(self.start_date, self.end_date, incremental=incremental)
+        print(f"Appended {len(new_bars)} new ES bars to {store.store_path.name}/")
+        return new_bars
 
+    @instrumented()
     def run(self):
         spx = self.fetch_spx_daily()
         es_1m = self.fetch_es_1min()
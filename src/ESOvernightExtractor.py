@@ -1,12 +1,13 @@
 import pandas as pd
 from pathlib import Path
+from ESBarStore import ESBarStore
 
 class ESOvernightWindowExtractor:
     def __init__(self, data_path="data"):
         self.data_path = Path(data_path)
         self.auction_file = self.data_path / "auction_daily_quotes.parquet"
-        self.es_file = self.data_path / "es_futures_1m_all.csv"
         self.timezone = "America/New_York"
+        self.es_store = ESBarStore(self.data_path, timezone=self.timezone)
         self._load_data()
 
     def _load_data(self):
@@ -14,23 +15,25 @@ class ESOvernightWindowExtractor:
         self.auction_quotes["date"] = pd.to_datetime(self.auction_quotes["date"]).dt.tz_localize(None)
         self.auction_dates = pd.to_datetime(self.auction_quotes["date"]).dt.tz_localize(None)
 
-        self.es_futures = pd.read_csv(self.es_file, index_col=0, parse_dates=True)
-        self.es_futures.index = pd.to_datetime(self.es_futures.index).tz_localize("UTC").tz_convert(self.timezone)
+        self.es_futures = self.es_store.load()
 
-    def get_es_slice(self, auction_date):
-        if auction_date.tzinfo is None:
-            auction_date = auction_date.tz_localize(self.timezone)
+    def get_window_offsets(self, auction_dates):
+        auction_dates = pd.DatetimeIndex(auction_dates)
+        if auction_dates.tz is None:
+            auction_dates = auction_dates.tz_localize(self.timezone)
 
-        t_minus_1 = auction_date - pd.Timedelta(days=1)
-        start = pd.Timestamp(f"{t_minus_1.date()} 16:00", tz=self.timezone)
-        end = pd.Timestamp(f"{auction_date.date()} 09:30", tz=self.timezone)
+        start = ESBarStore.wall_times(auction_dates, "16:00", self.timezone, days=-1)
+        end = ESBarStore.wall_times(auction_dates, "09:30", self.timezone)
+        return ESBarStore.window_offsets(self.es_futures.index, start, end)
 
-        return self.es_futures.loc[(self.es_futures.index >= start) & (self.es_futures.index <= end)].copy()
+    def get_es_slice(self, auction_date):
+        lo, hi = self.get_window_offsets([auction_date])
+        return self.es_futures.iloc[lo[0]:hi[0]]
 
     def get_all_slices(self):
-        slices = {}
-        for date in self.auction_dates:
-            auction_date = pd.Timestamp(date).tz_localize(self.timezone)
-            es_window = self.get_es_slice(auction_date)
-            slices[auction_date.strftime("%Y-%m-%d")] = es_window
-        return slices
+        auction_dates = pd.DatetimeIndex(self.auction_dates).tz_localize(self.timezone)
+        lo, hi = self.get_window_offsets(auction_dates)
+        return {
+            auction_date.strftime("%Y-%m-%d"): self.es_futures.iloc[start:stop]
+            for auction_date, start, stop in zip(auction_dates, lo, hi)
+        }
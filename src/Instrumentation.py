@@ -0,0 +1,333 @@
+import cProfile
+import contextvars
+import fnmatch
+import functools
+import json
+import logging
+import os
+import resource
+import shutil
+import signal
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterable, Optional, Union
+
+# stage timings and counters go to the "volauction.metrics" logger as one JSON object per stage, and are summed
+# per stage for an optional Prometheus text file. Everything is configurable from the environment:
+#   VOLAUCTION_METRICS_LOG   "stderr" or a file path for the JSON stage log
+#   VOLAUCTION_METRICS_FILE  Prometheus text file, rewritten whenever a top-level stage finishes
+#   VOLAUCTION_PROFILE       comma-separated stage name patterns to run under cProfile ("*" for all)
+#   VOLAUCTION_PROFILE_DIR   where .prof (and py-spy .svg) files go, default "profiles"
+#   VOLAUCTION_PYSPY         "1" to also record a py-spy flame graph of profiled stages, if py-spy is installed
+logger = logging.getLogger("volauction.metrics")
+
+_config = {
+    "metrics_file": None,
+    "profile": (),
+    "profile_dir": Path("profiles"),
+    "py_spy": False,
+}
+_lock = threading.Lock()
+_current = contextvars.ContextVar("volauction_stage", default=None)
+_stage_totals = {}
+_http_totals = {}
+_profiling = threading.local()
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+_MAXRSS_UNIT = 1 if sys.platform == "darwin" else 1024
+
+
+def configure(log: Optional[str] = None, metrics_file=None, profile: Union[str, Iterable[str], None] = None,
+              profile_dir=None, py_spy: Optional[bool] = None):
+    if log is not None:
+        handler = logging.StreamHandler(sys.stderr) if log == "stderr" else logging.FileHandler(log)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    if metrics_file is not None:
+        _config["metrics_file"] = Path(metrics_file)
+    if profile is not None:
+        patterns = profile.split(",") if isinstance(profile, str) else profile
+        _config["profile"] = tuple(p.strip() for p in patterns if p.strip())
+    if profile_dir is not None:
+        _config["profile_dir"] = Path(profile_dir)
+    if py_spy is not None:
+        _config["py_spy"] = py_spy
+
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * _MAXRSS_UNIT
+
+
+def _nbytes(value) -> int:
+    if value is None:
+        return 0
+    if isinstance(value, (int, float)):
+        return int(value)
+    path = Path(value)
+    if path.is_dir():
+        return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+    return path.stat().st_size if path.exists() else 0
+
+
+def count_rows(value) -> Optional[int]:
+    # DataFrames, Series and arrays count their rows; a tuple result counts its first element
+    if isinstance(value, tuple) and value:
+        value = value[0]
+    shape = getattr(value, "shape", None)
+    if isinstance(shape, tuple) and shape:
+        return int(shape[0])
+    if isinstance(value, (list, dict)):
+        return len(value)
+    return None
+
+
+class StageRecord:
+    def __init__(self, name: str, rows_in: Optional[int] = None, labels: Optional[dict] = None):
+        self.name = name
+        self.labels = labels or {}
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.http_requests = 0
+        self.http_seconds = 0.0
+        self.http_bytes = 0
+        self.wall_s = None
+        self.status = "ok"
+        self._lock = threading.Lock()
+
+    def read(self, value):
+        with self._lock:
+            self.bytes_read += _nbytes(value)
+
+    def wrote(self, value):
+        with self._lock:
+            self.bytes_written += _nbytes(value)
+
+    def http(self, seconds: float, nbytes: int):
+        with self._lock:
+            self.http_requests += 1
+            self.http_seconds += seconds
+            self.http_bytes += nbytes
+
+
+def current_stage() -> Optional[StageRecord]:
+    return _current.get()
+
+
+def record_io(read=None, written=None):
+    # bytes (or the size of a file/directory) read or written by the innermost active stage
+    stage_record = _current.get()
+    if stage_record is not None:
+        if read is not None:
+            stage_record.read(read)
+        if written is not None:
+            stage_record.wrote(written)
+
+
+def record_http(endpoint: str, seconds: float, nbytes: int = 0, status: Optional[int] = None):
+    with _lock:
+        totals = _http_totals.setdefault(endpoint, {"requests": 0, "seconds": 0.0, "bytes": 0, "errors": 0})
+        totals["requests"] += 1
+        totals["seconds"] += seconds
+        totals["bytes"] += nbytes
+        totals["errors"] += int(status is not None and status >= 400)
+    stage_record = _current.get()
+    if stage_record is not None:
+        stage_record.http(seconds, nbytes)
+
+
+def _should_profile(name: str) -> bool:
+    return any(fnmatch.fnmatchcase(name, pattern) for pattern in _config["profile"])
+
+
+@contextmanager
+def _profiled(name: str):
+    # one cProfile per thread at a time; a profiled stage nested in another is covered by the outer profile
+    if not _should_profile(name) or getattr(_profiling, "active", False):
+        yield
+        return
+    out_dir = _config["profile_dir"]
+    out_dir.mkdir(parents=True, exist_ok=True)
+    stem = out_dir / f"{name}-{os.getpid()}-{time.strftime('%Y%m%dT%H%M%S')}"
+
+    spy = None
+    if _config["py_spy"] and shutil.which("py-spy"):
+        spy = subprocess.Popen(["py-spy", "record", "--pid", str(os.getpid()), "--output", f"{stem}.svg", "--nonblocking"],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    profiler = cProfile.Profile()
+    _profiling.active = True
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        _profiling.active = False
+        profiler.dump_stats(f"{stem}.prof")
+        if spy is not None:
+            spy.send_signal(signal.SIGINT)
+            spy.wait(timeout=30)
+
+
+def _emit(stage_record: StageRecord, rss_start: int):
+    rss_end = _rss_bytes()
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * _MAXRSS_UNIT
+    record = {
+        "stage": stage_record.name,
+        **stage_record.labels,
+        "status": stage_record.status,
+        "wall_s": round(stage_record.wall_s, 6),
+        "rows_in": stage_record.rows_in,
+        "rows_out": stage_record.rows_out,
+        "bytes_read": stage_record.bytes_read,
+        "bytes_written": stage_record.bytes_written,
+        "http_requests": stage_record.http_requests,
+        "http_seconds": round(stage_record.http_seconds, 6),
+        "rss_mb": round(rss_end / 2**20, 1),
+        "rss_delta_mb": round((rss_end - rss_start) / 2**20, 1),
+        "max_rss_mb": round(max_rss / 2**20, 1),
+    }
+
+    with _lock:
+        totals = _stage_totals.setdefault(stage_record.name, {
+            "runs": 0, "errors": 0, "seconds": 0.0, "last_seconds": 0.0, "rows_in": 0, "rows_out": 0,
+            "bytes_read": 0, "bytes_written": 0, "http_requests": 0, "http_seconds": 0.0, "max_rss_bytes": 0,
+        })
+        totals["runs"] += 1
+        totals["errors"] += int(stage_record.status != "ok")
+        totals["seconds"] += stage_record.wall_s
+        totals["last_seconds"] = stage_record.wall_s
+        totals["rows_in"] += stage_record.rows_in or 0
+        totals["rows_out"] += stage_record.rows_out or 0
+        totals["bytes_read"] += stage_record.bytes_read
+        totals["bytes_written"] += stage_record.bytes_written
+        totals["http_requests"] += stage_record.http_requests
+        totals["http_seconds"] += stage_record.http_seconds
+        totals["max_rss_bytes"] = max(totals["max_rss_bytes"], max_rss)
+
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps(record, default=str))
+
+
+@contextmanager
+def stage(name: str, rows_in: Optional[int] = None, **labels):
+    stage_record = StageRecord(name, rows_in, labels)
+    parent = _current.get()
+    token = _current.set(stage_record)
+    rss_start = _rss_bytes()
+    start = time.perf_counter()
+    try:
+        with _profiled(name):
+            yield stage_record
+    except BaseException:
+        stage_record.status = "error"
+        raise
+    finally:
+        stage_record.wall_s = time.perf_counter() - start
+        _current.reset(token)
+        # I/O and HTTP of a nested stage also count towards the stages around it
+        if parent is not None:
+            parent.read(stage_record.bytes_read)
+            parent.wrote(stage_record.bytes_written)
+            with parent._lock:
+                parent.http_requests += stage_record.http_requests
+                parent.http_seconds += stage_record.http_seconds
+                parent.http_bytes += stage_record.http_bytes
+        _emit(stage_record, rss_start)
+        if parent is None and _config["metrics_file"] is not None:
+            write_prometheus(_config["metrics_file"])
+
+
+def instrumented(name: Optional[str] = None, rows_in: Optional[Callable] = None):
+    # rows_in defaults to the rows of the DataFrame/array arguments, rows_out to those of the return value
+    def decorate(fn):
+        stage_name = name or fn.__qualname__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if rows_in is not None:
+                n_in = rows_in(*args, **kwargs)
+            else:
+                counts = [count_rows(a) for a in list(args) + list(kwargs.values()) if hasattr(a, "shape")]
+                counts = [c for c in counts if c is not None]
+                n_in = sum(counts) if counts else None
+            with stage(stage_name, n_in) as stage_record:
+                result = fn(*args, **kwargs)
+                if stage_record.rows_out is None:
+                    stage_record.rows_out = count_rows(result)
+                return result
+        return wrapper
+    return decorate
+
+
+def stage_totals() -> dict:
+    with _lock:
+        return {name: dict(totals) for name, totals in _stage_totals.items()}
+
+
+def reset():
+    with _lock:
+        _stage_totals.clear()
+        _http_totals.clear()
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def write_prometheus(path):
+    metrics = [
+        ("volauction_stage_runs_total", "counter", "Completed runs of a pipeline stage", "runs"),
+        ("volauction_stage_errors_total", "counter", "Runs of a pipeline stage that raised", "errors"),
+        ("volauction_stage_seconds_total", "counter", "Wall time spent in a pipeline stage", "seconds"),
+        ("volauction_stage_last_seconds", "gauge", "Wall time of the latest run of a pipeline stage", "last_seconds"),
+        ("volauction_stage_rows_in_total", "counter", "Rows passed into a pipeline stage", "rows_in"),
+        ("volauction_stage_rows_out_total", "counter", "Rows returned by a pipeline stage", "rows_out"),
+        ("volauction_stage_bytes_read_total", "counter", "Bytes read by a pipeline stage", "bytes_read"),
+        ("volauction_stage_bytes_written_total", "counter", "Bytes written by a pipeline stage", "bytes_written"),
+        ("volauction_stage_http_requests_total", "counter", "HTTP requests made inside a pipeline stage", "http_requests"),
+        ("volauction_stage_http_seconds_total", "counter", "HTTP latency accumulated inside a pipeline stage", "http_seconds"),
+        ("volauction_stage_max_rss_bytes", "gauge", "Process peak RSS when a pipeline stage last finished", "max_rss_bytes"),
+    ]
+    http_metrics = [
+        ("volauction_http_requests_total", "counter", "HTTP requests by endpoint", "requests"),
+        ("volauction_http_request_seconds_total", "counter", "HTTP latency by endpoint", "seconds"),
+        ("volauction_http_response_bytes_total", "counter", "HTTP response bytes by endpoint", "bytes"),
+        ("volauction_http_errors_total", "counter", "HTTP error responses by endpoint", "errors"),
+    ]
+    with _lock:
+        stages = {name: dict(totals) for name, totals in _stage_totals.items()}
+        endpoints = {name: dict(totals) for name, totals in _http_totals.items()}
+
+    lines = []
+    for metric, kind, help_text, key in metrics:
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} {kind}"]
+        lines += [f'{metric}{{stage="{_escape(name)}"}} {totals[key]}' for name, totals in sorted(stages.items())]
+    for metric, kind, help_text, key in http_metrics:
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} {kind}"]
+        lines += [f'{metric}{{endpoint="{_escape(name)}"}} {totals[key]}' for name, totals in sorted(endpoints.items())]
+
+    # written whole and swapped in, so a node_exporter textfile collector never scrapes a partial file
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp_path.write_text("\n".join(lines) + "\n")
+    os.replace(tmp_path, path)
+
+
+configure(
+    log=os.environ.get("VOLAUCTION_METRICS_LOG"),
+    metrics_file=os.environ.get("VOLAUCTION_METRICS_FILE"),
+    profile=os.environ.get("VOLAUCTION_PROFILE"),
+    profile_dir=os.environ.get("VOLAUCTION_PROFILE_DIR"),
+    py_spy=os.environ.get("VOLAUCTION_PYSPY") == "1" if "VOLAUCTION_PYSPY" in os.environ else None,
+)
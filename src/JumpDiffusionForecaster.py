@@ -1,23 +1,169 @@
+import warnings
 import numpy as np
 import pandas as pd
 from pathlib import Path
 import matplotlib.pyplot as plt
-from typing import Optional, Tuple
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from scipy.special import gammaln, ndtri
+from scipy.stats import binom, qmc
+from ESBarStore import ESBarStore
+from Instrumentation import instrumented
+from PathStatistics import PathStatistics
+from ResultCache import ResultCache
+from typing import Iterator, Optional, Sequence, Tuple
+
+GRID_BOUNDS = {
+    "Threshold": (2.0, 3.5),
+    "StdScale": (0.9, 1.6),
+    "LambdaScale": (1.0, 2.0),
+}
+VARIANCE_REDUCTION = ("antithetic", "sobol", "stratified_jumps", "control_variate")
+
+
+def _draw_shocks(rng: np.random.Generator, n: int, steps: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # diffusion normals, jump-arrival uniforms and jump-size normals, all standardized so the
+    # same block can be re-used under different (sigma, lambda, jump) parameters
+    return rng.standard_normal((n, steps)), rng.random((n, steps)), rng.standard_normal((n, steps))
+
+
+def _paths_from_shocks(shocks, dt: float, S0: float, mu: float, sigma: float, lambda_: float, jump_mean: float, jump_std: float) -> np.ndarray:
+    z_diff, u_jump, z_jump = shocks
+    n, steps = z_diff.shape
+    increments = z_diff * (sigma * np.sqrt(dt))
+    increments += (mu - 0.5 * sigma**2) * dt
+
+    # a step jumps when its Poisson count is non-zero, i.e. with probability 1 - exp(-lambda * dt)
+    jump_idx = np.nonzero(u_jump < -np.expm1(-lambda_ * dt))
+    increments[jump_idx] -= np.abs(jump_mean + jump_std * z_jump[jump_idx])
+
+    log_paths = np.empty((n, steps + 1))
+    log_paths[:, 0] = 0.0
+    np.cumsum(increments, axis=1, out=log_paths[:, 1:])
+    log_paths += np.log(S0)
+    return np.exp(log_paths, out=log_paths)
+
+
+def _brownian_bridge(z: np.ndarray) -> np.ndarray:
+    # standard normals in construction order -> unit Brownian increments: the first sets the terminal point and each
+    # later one bisects an interval whose ends are fixed, so the leading coordinates carry the coarse path shape
+    n, steps = z.shape
+    W = np.zeros((n, steps + 1))
+    W[:, steps] = np.sqrt(steps) * z[:, 0]
+    k = 1
+    intervals = deque([(0, steps)])
+    while intervals:
+        left, right = intervals.popleft()
+        if right - left < 2:
+            continue
+        mid = (left + right) // 2
+        span = right - left
+        W[:, mid] = ((right - mid) * W[:, left] + (mid - left) * W[:, right]) / span
+        W[:, mid] += np.sqrt((mid - left) * (right - mid) / span) * z[:, k]
+        k += 1
+        intervals += [(left, mid), (mid, right)]
+    return np.diff(W, axis=1)
+
+
+def _sobol_normals(sobol: qmc.Sobol, n: int) -> np.ndarray:
+    # the next n points of a scrambled Sobol sequence as Brownian-bridge increments; n need not be a power of two
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)
+        u = sobol.random(n)
+    return _brownian_bridge(ndtri(np.clip(u, 1e-12, 1 - 1e-12)))
+
+
+def _draw_reduced_shocks(rng: np.random.Generator, n: int, steps: int, p_jump: float, antithetic=False,
+                         sobol: Optional[qmc.Sobol] = None, strata: Optional[np.ndarray] = None):
+    # _draw_shocks with variance reduction: diffusion normals from a Sobol bridge, jump counts through the
+    # Binomial(steps, p_jump) inverse CDF at stratified uniforms, and antithetic mirrors of all of it (2n paths)
+    if sobol is None and strata is None:
+        z_diff, u_jump, z_jump = _draw_shocks(rng, n, steps)
+    else:
+        z_diff = _sobol_normals(sobol, n) if sobol is not None else rng.standard_normal((n, steps))
+        z_jump = rng.standard_normal((n, steps))
+        if strata is not None:
+            # u_jump of 0 forces a jump and 1 rules one out, so each path jumps exactly at its first `count` ranks
+            ranks = rng.random((n, steps)).argsort(axis=1).argsort(axis=1)
+            u_jump = (ranks >= binom.ppf(strata, steps, p_jump)[:, None]).astype(np.float64)
+        else:
+            u_jump = rng.random((n, steps))
+    if not antithetic:
+        return z_diff, u_jump, z_jump
+    # a path vol is even in the diffusion shocks, so mirrored pairs only decorrelate through their jumps
+    if strata is not None:
+        u_mirror = (ranks >= binom.ppf(1 - strata, steps, p_jump)[:, None]).astype(np.float64)
+    else:
+        u_mirror = 1 - u_jump
+    return np.vstack([z_diff, -z_diff]), np.vstack([u_jump, u_mirror]), np.vstack([z_jump, -z_jump])
+
+
+def _control_means(sigma: float, dt: float, steps: int, p_jump: float, jump_mean: float, jump_std: float) -> np.ndarray:
+    # analytic means of the two controls: the GBM vol, E[np.std] of `steps` iid N(0, sigma^2 dt) increments scaled
+    # like the path vols, and the jumps' quadratic variation, E[count] * E[size^2]
+    gbm_vol = sigma * np.sqrt(dt * 390) * np.sqrt(2 / steps) * np.exp(gammaln(steps / 2) - gammaln((steps - 1) / 2))
+    return np.array([gbm_vol, steps * p_jump * (jump_mean**2 + jump_std**2)])
+
+
+_grid_state = {}
+
+
+def _init_grid_worker(state):
+    _grid_state.clear()
+    _grid_state.update(state)
+
+
+def _iter_candidate_shocks(state, n_paths: int, candidate_seed) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    if state["shocks"] is not None:
+        yield tuple(block[:n_paths] for block in state["shocks"])
+        return
+    # common random numbers too large to hold are re-drawn chunk by chunk from one seed shared by every candidate
+    seed = state["shock_seed"] if state["shock_seed"] is not None else candidate_seed
+    rng = np.random.default_rng(seed)
+    steps = len(state["es_prices"]) - 1
+    chunk_size = state["chunk_size"] or n_paths
+    for start in range(0, n_paths, chunk_size):
+        yield _draw_shocks(rng, min(chunk_size, n_paths - start), steps)
+
+
+def _score_grid_candidate(candidate, n_paths=None):
+    state = _grid_state
+    lambda_, jump_mean, jump_std, candidate_seed = candidate
+    es_prices = state["es_prices"]
+    stats = PathStatistics(len(es_prices))
+    for shocks in _iter_candidate_shocks(state, n_paths or state["n_paths"], candidate_seed):
+        stats.update(_paths_from_shocks(shocks, state["dt"], state["S0"], state["mu"], state["sigma"], lambda_, jump_mean, jump_std))
+    return stats.coverage(es_prices), stats.z_score(es_prices)
+
+
 
 class JumpDiffusionForecaster:
-    def __init__(self, data_path="data", dt=1/390, T=1/6.5, n_paths=1000):
+    def __init__(self, data_path="data", dt=1/390, T=1/6.5, n_paths=1000, seed=None, chunk_size=50_000,
+                 cache: Optional[ResultCache] = None, variance_reduction: Sequence[str] = (), replicates=8):
         self.data_path = Path(data_path)
         self.dt = dt
         self.T = T
         self.n_paths = n_paths
         self.N = int(self.T / self.dt)
-        self.df = pd.read_csv(self.data_path / "es_futures_1m_all.csv")
-        self.df["Datetime"] = pd.to_datetime(self.df["Datetime"])
-        self.df.set_index("Datetime", inplace=True)
+        self.seed = seed
+        self.chunk_size = chunk_size
+        self.rng = np.random.default_rng(seed)
+        self.cache = cache
+        self.variance_reduction = self._variance_reduction(variance_reduction)
+        self.replicates = replicates
+        self.store = ESBarStore(self.data_path)
+        self.df = self.store.load()
         self.df["date"] = self.df.index.date
         self.df["time"] = self.df.index.time
+        self._overnight_returns = None
 
     def _compute_overnight_returns(self, window_size=10) -> pd.Series:
+        # self.df is fixed after construction, so the close/open merge only runs once
+        if self._overnight_returns is None:
+            self._overnight_returns = self._merge_overnight_returns()
+        return self._overnight_returns.tail(window_size)
+
+    def _merge_overnight_returns(self) -> pd.Series:
         close_df = self.df[self.df["time"] == pd.to_datetime("16:00:00").time()][["Close"]].copy()
         open_df = self.df[self.df["time"] == pd.to_datetime("09:30:00").time()][["Close"]].copy()
 
@@ -32,91 +178,283 @@ class JumpDiffusionForecaster:
         ).shift(-1).dropna()
 
         merged["overnight_return"] = np.log(merged["open"] / merged["close"])
-        return merged["overnight_return"].tail(window_size)
-
-    def simulate_paths(self, S0: float, mu: float, sigma: float, lambda_: float, jump_mean: float, jump_std: float) -> np.ndarray:
-        paths = np.zeros((self.n_paths, self.N))
-        paths[:, 0] = S0
-
-        for i in range(self.n_paths):
-            for t in range(1, self.N):
-                dW = np.random.normal(0, np.sqrt(self.dt))
-                dN = np.random.poisson(lambda_ * self.dt)
-                J = -abs(np.random.normal(jump_mean, jump_std)) if dN else 0
-                paths[i, t] = paths[i, t - 1] * np.exp((mu - 0.5 * sigma**2) * self.dt + sigma * dW + J)
-        return paths
-
-    def forecast_volatility(self, window_size=10, threshold=3, jump_std_scale=1.5, lambda_scale=2.0) -> Tuple[float, float, float, float, float]:
-        log_returns = self._compute_overnight_returns(window_size)
-        mu = log_returns.mean()
-        sigma = log_returns.std()
+        return merged["overnight_return"]
 
+    def _estimate_jump_params(self, log_returns: pd.Series, mu: float, sigma: float, threshold: float,
+                              jump_std_scale: float, lambda_scale: float) -> Tuple[float, float, float]:
         jumps = log_returns[np.abs(log_returns - mu) > threshold * sigma]
         lambda_ = (len(jumps) / len(log_returns)) * lambda_scale
         jump_mean = -abs(jumps.mean()) if len(jumps) > 0 else -0.0001
         jump_std = jumps.std() * jump_std_scale if len(jumps) > 0 else 0.0002
+        return lambda_, jump_mean, jump_std
 
+    def _latest_session_prices(self) -> Tuple[float, np.ndarray]:
         latest_date = self.df["date"].max()
         intraday = self.df[(self.df["date"] == latest_date) & (self.df["time"] >= pd.to_datetime("09:30:00").time())]
         es_prices = intraday["Close"].values
         S0 = es_prices[0] if len(es_prices) > 0 else self.df["Close"].iloc[-1]
+        return S0, es_prices
 
-        paths = self.simulate_paths(S0, mu, sigma, lambda_, jump_mean, jump_std)
-        log_returns_paths = np.log(paths[:, 1:] / paths[:, :-1])
-        path_vols = np.std(log_returns_paths, axis=1) * np.sqrt(390)
-        mean_vol = path_vols.mean()
-        std_vol = path_vols.std()
+    def iter_paths(self, S0: float, mu: float, sigma: float, lambda_: float, jump_mean: float, jump_std: float,
+                   n_paths: Optional[int] = None, chunk_size: Optional[int] = None, seed: Optional[int] = None) -> Iterator[np.ndarray]:
+        rng = self.rng if seed is None else np.random.default_rng(seed)
+        n_paths = self.n_paths if n_paths is None else n_paths
+        chunk_size = chunk_size or self.chunk_size or n_paths
+        for start in range(0, n_paths, chunk_size):
+            n = min(chunk_size, n_paths - start)
+            shocks = _draw_shocks(rng, n, self.N - 1)
+            yield _paths_from_shocks(shocks, self.dt, S0, mu, sigma, lambda_, jump_mean, jump_std)
 
-        return mean_vol, std_vol, lambda_, jump_mean, jump_std
+    @instrumented()
+    def simulate_paths(self, S0: float, mu: float, sigma: float, lambda_: float, jump_mean: float, jump_std: float,
+                       seed: Optional[int] = None, dtype=np.float64, out_file=None) -> np.ndarray:
+        # out_file streams the paths into a memory-mapped .npy (np.load(..., mmap_mode="r") reads it back), so only
+        # one chunk is ever in memory; float32 halves it for paths that are only plotted
+        def simulate():
+            shape = (self.n_paths, self.N)
+            if out_file is not None:
+                paths = np.lib.format.open_memmap(out_file, mode="w+", dtype=dtype, shape=shape)
+            else:
+                paths = np.empty(shape, dtype=dtype)
+            start = 0
+            for chunk in self.iter_paths(S0, mu, sigma, lambda_, jump_mean, jump_std, seed=seed):
+                paths[start:start + len(chunk)] = chunk
+                start += len(chunk)
+            if out_file is not None:
+                paths.flush()
+            return paths
 
-    def grid_search(self, n_samples=25, z_threshold=0.2) -> pd.DataFrame:
-        log_returns = self._compute_overnight_returns()
+        # only explicitly seeded runs are reproducible, so only those are cached; with a cache every seeded call,
+        # hit or miss, returns the stored .npy as a read-only memmap
+        if self.cache is None or seed is None or out_file is not None:
+            return simulate()
+        params = {
+            "S0": S0, "mu": mu, "sigma": sigma, "lambda": lambda_, "jump_mean": jump_mean, "jump_std": jump_std,
+            "n_paths": self.n_paths, "N": self.N, "dt": self.dt, "seed": seed, "chunk_size": self.chunk_size,
+            "dtype": np.dtype(dtype).name,
+        }
+        return self.cache.memoize("simulate_paths", simulate, params)
+
+    @instrumented()
+    def path_statistics(self, S0: float, mu: float, sigma: float, lambda_: float, jump_mean: float, jump_std: float,
+                        seed: Optional[int] = None, n_paths: Optional[int] = None, quantiles: Sequence[float] = (5, 95)) -> PathStatistics:
+        # simulate_paths without the paths: vol moments and bands accumulate chunk by chunk, so memory stays at one
+        # chunk (plus the band sketch) for any n_paths
+        stats = PathStatistics(self.N, quantiles)
+        for chunk in self.iter_paths(S0, mu, sigma, lambda_, jump_mean, jump_std, n_paths=n_paths, seed=seed):
+            stats.update(chunk)
+        return stats
+
+    @instrumented()
+    def forecast_volatility(self, window_size=10, threshold=3, jump_std_scale=1.5, lambda_scale=2.0) -> Tuple[float, float, float, float, float]:
+        if self.cache is None or self.seed is None:
+            return self._forecast_volatility(window_size, threshold, jump_std_scale, lambda_scale)
+
+        # cached forecasts re-seed from self.seed so the result depends only on the inputs and parameters
+        params = {
+            "window_size": window_size, "threshold": threshold, "jump_std_scale": jump_std_scale,
+            "lambda_scale": lambda_scale, "dt": self.dt, "T": self.T, "n_paths": self.n_paths, "seed": self.seed,
+            "chunk_size": self.chunk_size, "variance_reduction": self.variance_reduction, "replicates": self.replicates,
+        }
+        return self.cache.memoize(
+            "forecast_volatility",
+            lambda: self._forecast_volatility(window_size, threshold, jump_std_scale, lambda_scale, seed=self.seed),
+            params,
+            [self.store.fingerprint_file()],
+        )
+
+    def _forecast_volatility(self, window_size, threshold, jump_std_scale, lambda_scale, seed=None):
+        params = self.calibrate(window_size, threshold, jump_std_scale, lambda_scale)
+        S0, _ = self._latest_session_prices()
+        mean_vol, std_vol = self.forecast_from(S0, params, seed=seed)
+        return mean_vol, std_vol, params["lambda_"], params["jump_mean"], params["jump_std"]
+
+    def calibrate(self, window_size=10, threshold=3, jump_std_scale=1.5, lambda_scale=2.0,
+                  latest_return: Optional[float] = None) -> dict:
+        # a live session passes its overnight return so far, which stands in for the oldest of the window
+        if latest_return is None:
+            log_returns = self._compute_overnight_returns(window_size)
+        else:
+            history = self._compute_overnight_returns(window_size).iloc[1:]
+            log_returns = pd.concat([history, pd.Series([latest_return])], ignore_index=True)
         mu = log_returns.mean()
         sigma = log_returns.std()
+        lambda_, jump_mean, jump_std = self._estimate_jump_params(log_returns, mu, sigma, threshold, jump_std_scale, lambda_scale)
+        return {"mu": mu, "sigma": sigma, "lambda_": lambda_, "jump_mean": jump_mean, "jump_std": jump_std}
 
-        thresholds = np.random.uniform(2.0, 3.5, n_samples)
-        std_scales = np.random.uniform(0.9, 1.6, n_samples)
-        lambda_scales = np.random.uniform(1.0, 2.0, n_samples)
+    def forecast_from(self, S0: float, params: dict, seed: Optional[int] = None) -> Tuple[float, float]:
+        stats = self.forecast_stats(S0, params, seed=seed)
+        return stats["mean_vol"], stats["std_vol"]
 
-        latest_date = self.df["date"].max()
-        intraday = self.df[(self.df["date"] == latest_date) & (self.df["time"] >= pd.to_datetime("09:30:00").time())]
-        es_prices = intraday["Close"].values
-        S0 = es_prices[0] if len(es_prices) > 0 else self.df["Close"].iloc[-1]
+    @staticmethod
+    def _variance_reduction(methods: Sequence[str]) -> Tuple[str, ...]:
+        methods = (methods,) if isinstance(methods, str) else tuple(methods)
+        unknown = set(methods) - set(VARIANCE_REDUCTION)
+        if unknown:
+            raise ValueError(f"Unknown variance reduction: {', '.join(sorted(unknown))}")
+        return tuple(m for m in VARIANCE_REDUCTION if m in methods)
+
+    def _iter_path_vols(self, S0: float, params: dict, rng: np.random.Generator, n_paths: int,
+                        methods: Tuple[str, ...]) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        # path vols, their controls (the vol of the diffusive part alone and the quadratic variation of the jumps)
+        # and the independent unit each path belongs to: itself, its antithetic pair, or its replicate once Sobol
+        # or stratified draws couple the paths
+        steps = self.N - 1
+        antithetic = "antithetic" in methods
+        coupled = "sobol" in methods or "stratified_jumps" in methods
+        n_replicates = self.replicates if coupled else 1
+        n_base = max(1, n_paths // (n_replicates * (1 + antithetic)))
+        chunk_size = max(1, (self.chunk_size or n_base) // (1 + antithetic))
+        p_jump = -np.expm1(-params["lambda_"] * self.dt)
+
+        unit = 0
+        for replicate in range(n_replicates):
+            sobol = qmc.Sobol(d=steps, scramble=True, seed=rng) if "sobol" in methods else None
+            strata = (rng.permutation(n_base) + rng.random(n_base)) / n_base if "stratified_jumps" in methods else None
+            for start in range(0, n_base, chunk_size):
+                n = min(chunk_size, n_base - start)
+                shocks = _draw_reduced_shocks(rng, n, steps, p_jump, antithetic, sobol,
+                                              strata[start:start + n] if strata is not None else None)
+                paths = _paths_from_shocks(shocks, self.dt, S0, **params)
+                vols = np.std(np.log(paths[:, 1:] / paths[:, :-1]), axis=1) * np.sqrt(390)
+                z_diff, u_jump, z_jump = shocks
+                jump_sq = np.where(u_jump < p_jump, (params["jump_mean"] + params["jump_std"] * z_jump)**2, 0.0)
+                controls = np.column_stack([np.std(z_diff, axis=1) * params["sigma"] * np.sqrt(self.dt * 390),
+                                            jump_sq.sum(axis=1)])
+                if coupled:
+                    units = np.full(len(vols), replicate)
+                else:
+                    units = unit + np.tile(np.arange(n), 1 + antithetic)
+                    unit += n
+                yield vols, controls, units
+
+    def forecast_stats(self, S0: float, params: dict, seed: Optional[int] = None, n_paths: Optional[int] = None,
+                       variance_reduction: Optional[Sequence[str]] = None) -> dict:
+        # mean_vol with its Monte Carlo standard error, taken across independent units (paths, antithetic pairs or
+        # randomized replicates); std_vol stays the spread of the path vols themselves
+        methods = self.variance_reduction if variance_reduction is None else self._variance_reduction(variance_reduction)
+        rng = self.rng if seed is None else np.random.default_rng(seed)
+        n_paths = self.n_paths if n_paths is None else n_paths
+        vols, controls, units = (np.concatenate(parts) for parts in zip(*self._iter_path_vols(S0, params, rng, n_paths, methods)))
+
+        adjusted = vols
+        if "control_variate" in methods:
+            # regression-estimated coefficients on whichever controls actually vary
+            p_jump = -np.expm1(-params["lambda_"] * self.dt)
+            deviations = controls - _control_means(params["sigma"], self.dt, self.N - 1, p_jump,
+                                                   params["jump_mean"], params["jump_std"])
+            live = controls.std(axis=0) > 0
+            if live.any():
+                centred = controls[:, live] - controls[:, live].mean(axis=0)
+                beta = np.linalg.lstsq(centred, vols - vols.mean(), rcond=None)[0]
+                adjusted = vols - deviations[:, live] @ beta
+
+        unit_means = np.bincount(units, adjusted) / np.bincount(units)
+        std_error = unit_means.std(ddof=1) / np.sqrt(len(unit_means)) if len(unit_means) > 1 else np.nan
+        return {
+            "mean_vol": unit_means.mean(),
+            "std_vol": vols.std(),
+            "std_error": std_error,
+            "n_paths": len(vols),
+            "variance_reduction": ",".join(methods) or "none",
+        }
 
-        results = []
+    @instrumented()
+    def convergence(self, path_counts: Sequence[int] = (250, 500, 1000, 2000, 4000),
+                    variance_reductions: Sequence[Sequence[str]] = ((), ("antithetic",), ("sobol",), ("stratified_jumps",),
+                                                                    ("control_variate",), VARIANCE_REDUCTION),
+                    window_size=10, threshold=3, jump_std_scale=1.5, lambda_scale=2.0, seed=None) -> pd.DataFrame:
+        # standard error against path count per variance-reduction mode on the current calibration. Speedup is
+        # how many plain paths each path is worth at that precision, std_vol^2 / (n * std_error^2)
+        params = self.calibrate(window_size, threshold, jump_std_scale, lambda_scale)
+        S0, _ = self._latest_session_prices()
+        rng = self.rng if seed is None else np.random.default_rng(seed)
 
-        for th, s_scale, l_scale in zip(thresholds, std_scales, lambda_scales):
-            jumps = log_returns[np.abs(log_returns - mu) > th * sigma]
-            lambda_ = len(jumps) / len(log_returns) * l_scale
-            jump_mean = -abs(jumps.mean()) if len(jumps) > 0 else -0.0001
-            jump_std = jumps.std() * s_scale if len(jumps) > 0 else 0.0002
+        rows = []
+        for methods in variance_reductions:
+            for n_paths in path_counts:
+                stats = self.forecast_stats(S0, params, seed=rng.integers(2**32), n_paths=n_paths, variance_reduction=methods)
+                speedup = stats["std_vol"]**2 / (stats["n_paths"] * stats["std_error"]**2)
+                rows.append((stats["variance_reduction"], stats["n_paths"], stats["mean_vol"], stats["std_vol"],
+                             stats["std_error"], speedup))
+        return pd.DataFrame(rows, columns=["VarianceReduction", "NPaths", "MeanVol", "StdVol", "StdError", "Speedup"])
+
+    def _sample_grid(self, n_samples: int, sampler: str) -> np.ndarray:
+        lower, upper = np.array(list(GRID_BOUNDS.values())).T
+        if sampler == "uniform":
+            unit = self.rng.random((n_samples, len(GRID_BOUNDS)))
+        elif sampler == "sobol":
+            unit = qmc.Sobol(d=len(GRID_BOUNDS), scramble=True, seed=self.rng).random(n_samples)
+        elif sampler == "lhs":
+            unit = qmc.LatinHypercube(d=len(GRID_BOUNDS), seed=self.rng).random(n_samples)
+        else:
+            raise ValueError(f"Unknown sampler: {sampler}")
+        return qmc.scale(unit, lower, upper)
+
+    def _score_grid(self, candidates: Sequence[tuple], state: dict, n_paths: int, n_workers: int) -> list:
+        if n_workers <= 1:
+            _init_grid_worker(state)
+            return [_score_grid_candidate(c, n_paths) for c in candidates]
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_grid_worker, initargs=(state,)) as pool:
+            return list(pool.map(_score_grid_candidate, candidates, [n_paths] * len(candidates),
+                                 chunksize=max(1, len(candidates) // (4 * n_workers))))
+
+    @instrumented()
+    def grid_search(self, n_samples=25, z_threshold=0.2, sampler="uniform", n_workers=1, common_random_numbers=True,
+                    prune_paths: Optional[int] = None, prune_keep=0.25) -> pd.DataFrame:
+        columns = ["Threshold", "StdScale", "LambdaScale", "Coverage", "ZScore"]
+        log_returns = self._compute_overnight_returns()
+        mu = log_returns.mean()
+        sigma = log_returns.std()
 
-            paths = self.simulate_paths(S0, mu, sigma, lambda_, jump_mean, jump_std)
-            lower_band = np.percentile(paths, 5, axis=0)
-            upper_band = np.percentile(paths, 95, axis=0)
+        grid = self._sample_grid(n_samples, sampler)
+        S0, es_prices = self._latest_session_prices()
+        if len(es_prices) < self.N:
+            return pd.DataFrame([], columns=columns)
 
-            if len(es_prices) >= self.N:
-                es_prices_clipped = es_prices[:self.N]
-                within_band = ((es_prices_clipped >= lower_band) & (es_prices_clipped <= upper_band)).mean()
+        candidate_seeds = self.rng.integers(0, 2**32, n_samples)
+        candidates = [
+            (*self._estimate_jump_params(log_returns, mu, sigma, th, s_scale, l_scale), candidate_seed)
+            for (th, s_scale, l_scale), candidate_seed in zip(grid, candidate_seeds)
+        ]
+        # shared shocks are held once when they fit in a chunk; past that every candidate re-draws them by chunk
+        hold_shocks = common_random_numbers and self.n_paths <= (self.chunk_size or self.n_paths)
+        state = {
+            "shocks": _draw_shocks(self.rng, self.n_paths, self.N - 1) if hold_shocks else None,
+            "shock_seed": self.rng.integers(2**32) if common_random_numbers and not hold_shocks else None,
+            "chunk_size": self.chunk_size,
+            "dt": self.dt,
+            "S0": S0,
+            "mu": mu,
+            "sigma": sigma,
+            "n_paths": self.n_paths,
+            "es_prices": es_prices[:self.N],
+        }
 
-                path_vols = np.std(np.log(paths[:, 1:] / paths[:, :-1]), axis=1) * np.sqrt(390)
-                mean_vol = path_vols.mean()
-                std_vol = path_vols.std()
-                realized_vol = np.std(np.log(es_prices_clipped[1:] / es_prices_clipped[:-1])) * np.sqrt(390)
-                z_score = (realized_vol - mean_vol) / std_vol
+        keep = np.arange(n_samples)
+        if prune_paths is not None and prune_paths < self.n_paths:
+            # screen every candidate on a subset of paths and only re-score the best |ZScore| fraction
+            screen = self._score_grid(candidates, state, prune_paths, n_workers)
+            n_keep = max(1, int(np.ceil(prune_keep * n_samples)))
+            keep = np.argsort(np.abs([z for _, z in screen]))[:n_keep]
 
-                results.append((th, s_scale, l_scale, within_band, z_score))
+        scores = self._score_grid([candidates[i] for i in keep], state, self.n_paths, n_workers)
+        results = [(*grid[i], within_band, z_score) for i, (within_band, z_score) in zip(keep, scores)]
 
-        return pd.DataFrame(results, columns=["Threshold", "StdScale", "LambdaScale", "Coverage", "ZScore"]).sort_values("ZScore", key=lambda x: x.abs())
+        return pd.DataFrame(results, columns=columns).sort_values("ZScore", key=lambda x: x.abs())
 
     def plot_simulations(self, paths: np.ndarray, es_prices: Optional[np.ndarray] = None):
+        # paths may be a memory-mapped store; the bands are read through it a chunk of rows at a time
         N = paths.shape[1]
         plt.figure(figsize=(12, 6))
         for i in range(min(50, len(paths))):
             plt.plot(paths[i], linewidth=0.7, alpha=0.5, color="steelblue")
 
-        lower_band = np.percentile(paths, 5, axis=0)
-        upper_band = np.percentile(paths, 95, axis=0)
+        stats = PathStatistics(N)
+        chunk_size = self.chunk_size or len(paths)
+        for start in range(0, len(paths), chunk_size):
+            stats.update(np.asarray(paths[start:start + chunk_size], dtype=np.float64))
+        lower_band, upper_band = stats.bands()
         plt.fill_between(range(N), lower_band, upper_band, color="cornflowerblue", alpha=0.2, label="5–95% Sim Band")
 
         if es_prices is not None and len(es_prices) >= N:
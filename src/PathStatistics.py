@@ -0,0 +1,112 @@
+import numpy as np
+from typing import Optional, Sequence, Tuple
+
+
+class StreamingQuantiles:
+    # per-column percentiles over a stream of row chunks. A lone chunk is answered exactly, as np.percentile would;
+    # from the second chunk on each column is a fixed-width histogram over the first chunk's range widened by
+    # `widen` of it on both sides (the edge bins absorb anything further out), so memory is n_bins per column
+    # however many rows stream through, and the error is at most one bin width
+    def __init__(self, n_columns: int, n_bins=4096, widen=0.5):
+        self.n_columns = n_columns
+        self.n_bins = n_bins
+        self.widen = widen
+        self.count = 0
+        self._first = None
+        self._counts = None
+
+    def _start_histogram(self, chunk: np.ndarray):
+        self._min = chunk.min(axis=0).astype(np.float64)
+        self._max = chunk.max(axis=0).astype(np.float64)
+        span = self._max - self._min
+        self._lo = self._min - self.widen * span
+        width = span * (1 + 2 * self.widen) / self.n_bins
+        # constant columns (every path starts at S0) still need a positive bin width
+        self._width = np.maximum(width, np.finfo(np.float64).eps * np.maximum(np.abs(self._lo), 1.0))
+        self._counts = np.zeros((self.n_columns, self.n_bins), dtype=np.int64)
+        self._add(chunk)
+
+    def _add(self, chunk: np.ndarray):
+        np.minimum(self._min, chunk.min(axis=0), out=self._min)
+        np.maximum(self._max, chunk.max(axis=0), out=self._max)
+        bins = np.floor((chunk - self._lo) / self._width)
+        np.clip(bins, 0, self.n_bins - 1, out=bins)
+        flat = bins.astype(np.int64) + np.arange(self.n_columns) * self.n_bins
+        self._counts += np.bincount(flat.ravel(), minlength=self.n_columns * self.n_bins).reshape(self._counts.shape)
+
+    def update(self, chunk: np.ndarray):
+        if self.count == 0:
+            self._first = np.array(chunk, dtype=np.float64)
+        else:
+            if self._counts is None:
+                self._start_histogram(self._first)
+                self._first = None
+            self._add(chunk)
+        self.count += len(chunk)
+
+    def percentile(self, q: float) -> np.ndarray:
+        if self._first is not None:
+            return np.percentile(self._first, q, axis=0)
+
+        # np.percentile's linear rank, located in the cumulative counts and interpolated within its bin
+        rank = q / 100 * (self.count - 1)
+        cumulative = self._counts.cumsum(axis=1)
+        b = np.minimum((cumulative <= rank).sum(axis=1), self.n_bins - 1)
+        rows = np.arange(self.n_columns)
+        in_bin = self._counts[rows, b]
+        before = cumulative[rows, b] - in_bin
+        fraction = (rank - before + 0.5) / np.maximum(in_bin, 1)
+        value = self._lo + self._width * (b + np.clip(fraction, 0.0, 1.0))
+        return np.clip(value, self._min, self._max)
+
+
+class PathStatistics:
+    # per-path realized vol (its mean and spread), percentile bands and band coverage, accumulated one chunk of
+    # paths at a time so nothing path-sized is kept; a lone chunk matches the dense np.std / np.percentile results
+    def __init__(self, n_steps: int, quantiles: Sequence[float] = (5, 95), n_bins=4096, trading_minutes=390):
+        self.quantiles = tuple(quantiles)
+        self.trading_minutes = trading_minutes
+        self.sketch = StreamingQuantiles(n_steps, n_bins)
+        self.n_paths = 0
+        self._first_vols = None
+        self._mean = 0.0
+        self._m2 = 0.0
+
+    def update(self, paths: np.ndarray) -> np.ndarray:
+        vols = np.std(np.log(paths[:, 1:] / paths[:, :-1]), axis=1) * np.sqrt(self.trading_minutes)
+        if self.n_paths == 0:
+            self._first_vols = vols
+        else:
+            if self._first_vols is not None:
+                self._mean, self._m2 = self._first_vols.mean(), self._first_vols.var() * len(self._first_vols)
+                self._first_vols = None
+            # Chan et al. merge of the chunk's moments into the running ones
+            n, chunk_mean = len(vols), vols.mean()
+            total = self.n_paths + n
+            delta = chunk_mean - self._mean
+            self._mean += delta * n / total
+            self._m2 += vols.var() * n + delta**2 * self.n_paths * n / total
+        self.sketch.update(paths)
+        self.n_paths += len(vols)
+        return vols
+
+    @property
+    def vol_mean(self) -> float:
+        return self._first_vols.mean() if self._first_vols is not None else self._mean
+
+    @property
+    def vol_std(self) -> float:
+        return self._first_vols.std() if self._first_vols is not None else np.sqrt(self._m2 / self.n_paths)
+
+    def bands(self) -> Tuple[np.ndarray, ...]:
+        return tuple(self.sketch.percentile(q) for q in self.quantiles)
+
+    def coverage(self, prices: np.ndarray, bands: Optional[Tuple[np.ndarray, np.ndarray]] = None) -> float:
+        # share of steps where the actual path sits inside the outermost band
+        lower, upper = bands if bands is not None else (self.sketch.percentile(min(self.quantiles)),
+                                                        self.sketch.percentile(max(self.quantiles)))
+        return ((prices >= lower) & (prices <= upper)).mean()
+
+    def z_score(self, prices: np.ndarray) -> float:
+        realized_vol = np.std(np.log(prices[1:] / prices[:-1])) * np.sqrt(self.trading_minutes)
+        return (realized_vol - self.vol_mean) / self.vol_std
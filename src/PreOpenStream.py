@@ -0,0 +1,204 @@
+import asyncio
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import Callable, Optional
+from ESBarStore import BAR_COLUMNS
+from JumpDiffusionForecaster import JumpDiffusionForecaster
+from RollingVolKernels import ESTIMATORS, OnlineVolEstimator, RollingMoments
+
+ONE_MINUTE = pd.Timedelta(minutes=1)
+
+
+async def replay_bars(bars: pd.DataFrame, queue: asyncio.Queue, speed: Optional[float] = None):
+    # feeds stored bars into the queue; speed=60 replays an hour a minute, None as fast as the consumer drains
+    prev_ts = None
+    for ts, *row in bars[BAR_COLUMNS].itertuples(name=None):
+        if speed and prev_ts is not None:
+            await asyncio.sleep((ts - prev_ts).total_seconds() / speed)
+        await queue.put((ts, *row))
+        prev_ts = ts
+    await queue.put(None)
+
+
+async def tail_bars(csv_file, queue: asyncio.Queue, timezone="America/New_York", poll_interval=0.25, from_start=False):
+    # follows a bar CSV in the es_futures_1m_all.csv layout as rows are appended to it, until cancelled
+    with open(csv_file) as f:
+        header = f.readline().rstrip("\n").split(",")
+        cols = [header.index(c) for c in ["Datetime"] + BAR_COLUMNS]
+        if not from_start:
+            f.seek(0, 2)
+        partial = ""
+        while True:
+            line = f.readline()
+            if not line:
+                await asyncio.sleep(poll_interval)
+                continue
+            partial += line
+            if not partial.endswith("\n"):
+                continue
+            fields = partial.rstrip("\n").split(",")
+            partial = ""
+            ts = pd.Timestamp(fields[cols[0]]).tz_convert(timezone)
+            await queue.put((ts, *(float(fields[i]) for i in cols[1:])))
+
+
+class PreOpenStream:
+    def __init__(self, forecaster: Optional[JumpDiffusionForecaster] = None, data_path="data", resample_interval="5min",
+                 window=5, trading_minutes=390, overnight_start="18:00", auction_time="09:30", prior_close_time="16:00",
+                 forecast_params: Optional[dict] = None, forecast_every=1, seed=None, auction_iv: Optional[float] = None,
+                 timezone="America/New_York", on_update: Optional[Callable[[dict], None]] = None):
+        self.forecaster = forecaster if forecaster is not None else JumpDiffusionForecaster(data_path, seed=seed)
+        self.interval = pd.Timedelta(pd.tseries.frequencies.to_offset(resample_interval))
+        self.estimator = OnlineVolEstimator(window, trading_minutes)
+        self.overnight_start = pd.to_timedelta(f"{overnight_start}:00")
+        self.auction_time = pd.to_timedelta(f"{auction_time}:00")
+        self.prior_close_time = pd.to_timedelta(f"{prior_close_time}:00")
+        self.forecast_params = forecast_params or {}
+        self.forecast_every = forecast_every
+        self.seed = seed
+        self.auction_iv = auction_iv
+        self.timezone = timezone
+        self.on_update = on_update
+
+        # 16:00 closes already in the store; the one before the first streamed bar anchors the overnight return
+        history = self.forecaster.df
+        self._prior_closes = history.loc[history.index - history.index.normalize() == self.prior_close_time, "Close"]
+        self.prior_close = np.nan
+
+        self._bucket = None
+        self._bar = None
+        self._est_date = None
+        self.estimates = dict.fromkeys(ESTIMATORS, np.nan)
+
+        self._session = None
+        self._overnight = RollingMoments(None)
+        self._overnight_prev = np.nan
+
+        self.n_bars = 0
+        self.forecast = (np.nan, np.nan)
+        self.snapshot = {}
+
+    def set_auction_iv(self, auction_iv: float):
+        self.auction_iv = auction_iv
+
+    def _finish_interval(self):
+        # one O(1) estimator update per completed interval bar; sessions reset at the calendar date, as in the batch estimators
+        date = self._bucket.date()
+        if date != self._est_date:
+            self.estimator.reset()
+            self._est_date = date
+        self.estimates = self.estimator.update(*self._bar)
+        self._bar = None
+
+    def _update_interval(self, ts, open_, high, low, close):
+        bucket = ts.floor(self.interval)
+        if self._bar is not None and bucket != self._bucket:
+            self._finish_interval()
+        if self._bar is None:
+            self._bucket = bucket
+            self._bar = [open_, high, low, close]
+        else:
+            self._bar[1] = max(self._bar[1], high)
+            self._bar[2] = min(self._bar[2], low)
+            self._bar[3] = close
+        # the bucket's last minute closes it, so the 09:25 bar is final as soon as the 09:29 bar lands
+        if ts + ONE_MINUTE >= bucket + self.interval:
+            self._finish_interval()
+
+    def _update_overnight(self, ts, close):
+        # [prior day 18:00, 09:30) with returns between in-window bars. AuctionVolPreprocessor's window also takes
+        # the 09:30 bar (one more return); the stream stops before it so the value is final when the auction
+        # prints rather than a minute later, and the two differ by that last return
+        clock = ts - ts.normalize()
+        if self.auction_time <= clock < self.overnight_start:
+            return
+        session = (ts + (pd.Timedelta(days=1) - self.overnight_start)).normalize()
+        if session != self._session:
+            self._session = session
+            self._overnight = RollingMoments(None)
+            self._overnight_prev = np.nan
+        self._overnight.push(np.log(close / self._overnight_prev))
+        self._overnight_prev = close
+
+    def _update_forecast(self, close):
+        latest_return = np.log(close / self.prior_close)
+        if not np.isfinite(latest_return):
+            return
+        params = self.forecaster.calibrate(**self.forecast_params, latest_return=latest_return)
+        self.forecast = self.forecaster.forecast_from(close, params, seed=self.seed)
+
+    def update(self, ts, open_, high, low, close, volume=0.0) -> dict:
+        ts = pd.Timestamp(ts)
+        ts = ts.tz_localize(self.timezone) if ts.tzinfo is None else ts.tz_convert(self.timezone)
+
+        if ts - ts.normalize() == self.prior_close_time:
+            self.prior_close = close
+        elif np.isnan(self.prior_close):
+            prior = self._prior_closes[self._prior_closes.index < ts]
+            self.prior_close = prior.iloc[-1] if len(prior) else np.nan
+
+        self._update_interval(ts, open_, high, low, close)
+        self._update_overnight(ts, close)
+        if self.n_bars % self.forecast_every == 0:
+            self._update_forecast(close)
+        self.n_bars += 1
+
+        n = self._overnight.n
+        forecast_vol, forecast_std = self.forecast
+        self.snapshot = {
+            "timestamp": ts,
+            "Close": close,
+            "OvernightReturn": np.log(close / self.prior_close),
+            "OvernightStd": np.sqrt(self._overnight.get_var() * n) if n > 1 else np.nan,
+            "OvernightTicks": n,
+            **self.estimates,
+            "ForecastVol": forecast_vol,
+            "ForecastStd": forecast_std,
+            "AuctionIV": self.auction_iv,
+            "Edge": self.auction_iv - forecast_vol if self.auction_iv is not None else np.nan,
+        }
+        if self.on_update is not None:
+            self.on_update(self.snapshot)
+        return self.snapshot
+
+    async def consume(self, queue: asyncio.Queue, until: Optional[pd.Timedelta] = None) -> dict:
+        # runs until a feeder puts None on the queue, or once a bar at or after the `until` clock time is processed
+        while True:
+            bar = await queue.get()
+            if bar is None:
+                return self.snapshot
+            snapshot = self.update(*bar)
+            ts = snapshot["timestamp"]
+            if until is not None and self.auction_time > ts - ts.normalize() >= until:
+                return snapshot
+
+    def replay(self, bars: pd.DataFrame, speed: Optional[float] = None) -> pd.DataFrame:
+        snapshots = []
+        on_update = self.on_update
+        self.on_update = lambda snapshot: (snapshots.append(snapshot), on_update and on_update(snapshot))
+
+        async def main():
+            queue = asyncio.Queue(maxsize=1024)
+            await asyncio.gather(replay_bars(bars, queue, speed), self.consume(queue))
+
+        try:
+            asyncio.run(main())
+        finally:
+            self.on_update = on_update
+        return pd.DataFrame(snapshots).set_index("timestamp") if snapshots else pd.DataFrame()
+
+    def follow(self, csv_file, poll_interval=0.25, from_start=False) -> dict:
+        # tails a live bar CSV (es_futures_1m_all.csv layout, written by the feed recorder; the downloader only
+        # appends to the es_bars store) and returns the signal once the last pre-auction bar (09:29) is processed
+        csv_file = Path(csv_file)
+
+        async def main():
+            queue = asyncio.Queue()
+            tailer = asyncio.create_task(tail_bars(csv_file, queue, self.timezone, poll_interval, from_start))
+            try:
+                return await self.consume(queue, until=self.auction_time - ONE_MINUTE)
+            finally:
+                tailer.cancel()
+
+        return asyncio.run(main())
@@ -0,0 +1,101 @@
+import hashlib
+import json
+import os
+import pickle
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+
+_MISSING = object()
+
+
+class ResultCache:
+    _file_hashes = {}
+
+    def __init__(self, cache_dir="data/cache", max_bytes=2 * 1024**3):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+
+    def fingerprint(self, path) -> str:
+        # content hash, memoized per (path, size, mtime) so unchanged inputs are only read once per process
+        path = Path(path)
+        stat = path.stat()
+        memo_key = (str(path.resolve()), stat.st_size, stat.st_mtime_ns)
+        if memo_key not in self._file_hashes:
+            digest = hashlib.sha256()
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(block)
+            self._file_hashes[memo_key] = digest.hexdigest()
+        return self._file_hashes[memo_key]
+
+    def key(self, method: str, params: Optional[dict] = None, input_files: Iterable = ()) -> str:
+        digest = hashlib.sha256(method.encode())
+        digest.update(json.dumps(params or {}, sort_keys=True, default=str).encode())
+        for path in sorted(str(p) for p in input_files):
+            digest.update(self.fingerprint(path).encode())
+        return digest.hexdigest()[:32]
+
+    def _find(self, method: str, key: str) -> Optional[Path]:
+        return next(iter(self.cache_dir.glob(f"{method}-{key}.*")), None)
+
+    def get(self, method: str, key: str):
+        path = self._find(method, key)
+        if path is None:
+            return _MISSING
+        os.utime(path)
+        if path.suffix == ".npy":
+            return np.load(path, mmap_mode="r")
+        if path.suffix == ".parquet":
+            return pd.read_parquet(path)
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+    def put(self, method: str, key: str, value):
+        if isinstance(value, np.ndarray):
+            suffix = ".npy"
+        elif isinstance(value, pd.DataFrame):
+            suffix = ".parquet"
+        else:
+            suffix = ".pkl"
+        path = self.cache_dir / f"{method}-{key}{suffix}"
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+
+        if suffix == ".npy":
+            with open(tmp_path, "wb") as f:
+                np.save(f, value)
+        elif suffix == ".parquet":
+            value.to_parquet(tmp_path, index=False)
+        else:
+            with open(tmp_path, "wb") as f:
+                pickle.dump(value, f)
+        os.replace(tmp_path, path)
+        self._evict()
+
+    def memoize(self, method: str, compute: Callable, params: Optional[dict] = None, input_files: Iterable = ()):
+        # arrays come back as read-only memmaps of the stored .npy on a miss as well as a hit, so callers see one
+        # kind of array either way and the computed copy is released
+        key = self.key(method, params, input_files)
+        value = self.get(method, key)
+        if value is _MISSING:
+            value = compute()
+            self.put(method, key, value)
+            if isinstance(value, np.ndarray):
+                value = self.get(method, key)
+        return value
+
+    def invalidate(self, method: Optional[str] = None):
+        for path in self.cache_dir.glob(f"{method}-*" if method else "*-*"):
+            path.unlink(missing_ok=True)
+
+    def _evict(self):
+        # least-recently-used first: hits refresh the entry's mtime
+        entries = sorted((p for p in self.cache_dir.iterdir() if not p.name.startswith(".")), key=lambda p: p.stat().st_mtime_ns)
+        total = sum(p.stat().st_size for p in entries)
+        for path in entries[:-1]:
+            if total <= self.max_bytes:
+                break
+            total -= path.stat().st_size
+            path.unlink(missing_ok=True)
@@ -0,0 +1,213 @@
+import numpy as np
+from collections import deque
+from typing import Dict, Iterable, Optional, Sequence, Union
+
+ESTIMATORS = ["Realized", "Parkinson", "GarmanKlass", "YangZhang"]
+_PARKINSON = 1 / (4 * np.log(2))
+_GK_OC = 2 * np.log(2) - 1
+# the log terms each estimator reads; only those are computed and rolled
+_TERMS = {
+    "Realized": ("r",),
+    "Parkinson": ("hl",),
+    "GarmanKlass": ("gk",),
+    "YangZhang": ("o", "hl", "c"),
+}
+
+
+def log_terms(open_, high, low, close, terms: Iterable[str] = ("r", "o", "c", "hl", "gk")) -> Dict[str, np.ndarray]:
+    # one log per price column; every ratio the estimators use is a difference of these
+    terms = set(terms)
+    log_c = np.log(np.asarray(close, dtype=np.float64))
+    prev_c = np.full_like(log_c, np.nan)
+    prev_c[1:] = log_c[:-1]
+
+    out = {}
+    if "r" in terms:
+        out["r"] = log_c - prev_c
+    if terms & {"o", "c", "gk"}:
+        log_o = np.log(np.asarray(open_, dtype=np.float64))
+        if "o" in terms:
+            out["o"] = log_o - prev_c
+        c = log_c - log_o
+        if "c" in terms:
+            out["c"] = c
+    if terms & {"hl", "gk"}:
+        hl = (np.log(np.asarray(high, dtype=np.float64)) - np.log(np.asarray(low, dtype=np.float64))) ** 2
+        if "hl" in terms:
+            out["hl"] = hl
+        if "gk" in terms:
+            out["gk"] = 0.5 * hl - _GK_OC * c**2
+    return out
+
+
+def combine(w: int, trading_minutes: float, var_r=np.nan, mean_hl=np.nan, mean_gk=np.nan, var_o=np.nan,
+            var_c=np.nan, estimators: Sequence[str] = ESTIMATORS) -> dict:
+    # the estimator formulas, shared by the batch kernels and the per-bar OnlineVolEstimator
+    scale = np.sqrt(trading_minutes / w)
+    out = {}
+    if "Realized" in estimators:
+        out["Realized"] = np.sqrt(var_r) * scale
+    if "Parkinson" in estimators:
+        out["Parkinson"] = np.sqrt(_PARKINSON * mean_hl) * scale
+    if "GarmanKlass" in estimators:
+        out["GarmanKlass"] = np.sqrt(mean_gk) * scale
+    if "YangZhang" in estimators:
+        k = 0.34 / (1.34 + (w + 1) / (w - 1))
+        out["YangZhang"] = np.sqrt(var_o + k * mean_hl + (1 - k) * var_c) * scale
+    return out
+
+
+def warmup_rows(name: str, w: int) -> int:
+    # rows at the start of a session whose window still reaches back into the previous one
+    return w if name in ("Realized", "YangZhang") else w - 1
+
+
+def _prefix(x: np.ndarray) -> np.ndarray:
+    # leading zero row, so the window ending at row i sums to prefix[i + 1] - prefix[i + 1 - w]
+    out = np.zeros((len(x) + 1,) + x.shape[1:])
+    np.cumsum(x, axis=0, out=out[1:])
+    return out
+
+
+class RollingWindows:
+    def __init__(self, x):
+        # prefix sums are taken once per series and answer any window length in O(1) per row; values are
+        # centred on the series mean first so the sum of squares does not cancel catastrophically
+        x = np.asarray(x, dtype=np.float64)
+        missing = np.isnan(x)
+        self.n = len(x)
+        self.shift = np.where(missing, 0.0, x).sum(axis=0) / np.maximum((~missing).sum(axis=0), 1)
+        centered = np.where(missing, 0.0, x - self.shift)
+        self.n_nan = _prefix(missing)
+        self.s1 = _prefix(centered)
+        self.s2 = _prefix(centered * centered)
+
+    def _window_sum(self, prefix: np.ndarray, w: int) -> np.ndarray:
+        out = np.full((self.n,) + prefix.shape[1:], np.nan)
+        if w <= self.n:
+            out[w - 1:] = prefix[w:] - prefix[:-w]
+        return out
+
+    def _complete(self, w: int) -> np.ndarray:
+        # like pandas rolling(w): a window with any NaN, or fewer than w rows, is NaN
+        return self._window_sum(self.n_nan, w) == 0
+
+    def mean(self, w: int) -> np.ndarray:
+        s1 = self._window_sum(self.s1, w)
+        return np.where(self._complete(w), self.shift + s1 / w, np.nan)
+
+    def var(self, w: int) -> np.ndarray:
+        s1 = self._window_sum(self.s1, w)
+        s2 = self._window_sum(self.s2, w)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            var = np.maximum(s2 - s1 * s1 / w, 0.0) / (w - 1)
+        return np.where(self._complete(w), var, np.nan)
+
+
+def rolling_vol(open_, high, low, close, windows: Union[int, Sequence[int]] = 5, trading_minutes=390,
+                estimators: Sequence[str] = ESTIMATORS) -> Dict[int, Dict[str, np.ndarray]]:
+    # one pass over OHLC for every estimator and window; arrays may be 2-D (bars x symbols), rolled along axis 0
+    windows = [windows] if np.isscalar(windows) else list(windows)
+    needed = {term for name in estimators for term in _TERMS[name]}
+    rolled = {term: RollingWindows(x) for term, x in log_terms(open_, high, low, close, needed).items()}
+
+    out = {}
+    for w in windows:
+        stats = {}
+        if "r" in rolled:
+            stats["var_r"] = rolled["r"].var(w)
+        if "hl" in rolled:
+            stats["mean_hl"] = rolled["hl"].mean(w)
+        if "gk" in rolled:
+            stats["mean_gk"] = rolled["gk"].mean(w)
+        if "o" in rolled:
+            stats["var_o"] = rolled["o"].var(w)
+            stats["var_c"] = rolled["c"].var(w)
+        out[w] = combine(w, trading_minutes, estimators=estimators, **stats)
+    return out
+
+
+class RollingMoments:
+    def __init__(self, window: Optional[int]):
+        self.window = window
+        self.values = deque()
+        self.n_nan = 0
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def push(self, x):
+        # Welford add/remove; a NaN anywhere in the window makes the window NaN, as pandas rolling does.
+        # window=None is an expanding window that skips NaNs and keeps no history
+        if self.window is None:
+            if not np.isnan(x):
+                self.n += 1
+                delta = x - self.mean
+                self.mean += delta / self.n
+                self.m2 += delta * (x - self.mean)
+            return
+
+        self.values.append(x)
+        if np.isnan(x):
+            self.n_nan += 1
+        else:
+            self.n += 1
+            delta = x - self.mean
+            self.mean += delta / self.n
+            self.m2 += delta * (x - self.mean)
+
+        if len(self.values) > self.window:
+            y = self.values.popleft()
+            if np.isnan(y):
+                self.n_nan -= 1
+            else:
+                self.n -= 1
+                if self.n == 0:
+                    self.mean, self.m2 = 0.0, 0.0
+                else:
+                    delta = y - self.mean
+                    self.mean -= delta / self.n
+                    self.m2 -= delta * (y - self.mean)
+
+    def full(self):
+        if self.window is None:
+            return self.n > 0
+        return len(self.values) == self.window and self.n_nan == 0
+
+    def get_mean(self):
+        return self.mean if self.full() else np.nan
+
+    def get_var(self):
+        return max(self.m2, 0.0) / (self.n - 1) if self.full() and self.n > 1 else np.nan
+
+
+class OnlineVolEstimator:
+    def __init__(self, window=5, trading_minutes=390):
+        self.window = window
+        self.trading_minutes = trading_minutes
+        self.reset()
+
+    def reset(self):
+        self.log_prev = np.nan
+        self.moments = {term: RollingMoments(self.window) for term in ("r", "o", "c", "hl", "gk")}
+
+    def update(self, open_, high, low, close) -> dict:
+        # the scalar form of log_terms for a single bar
+        log_o, log_c = np.log(open_), np.log(close)
+        hl = (np.log(high) - np.log(low)) ** 2
+        c = log_c - log_o
+        m = self.moments
+        m["r"].push(log_c - self.log_prev)
+        m["o"].push(log_o - self.log_prev)
+        m["c"].push(c)
+        m["hl"].push(hl)
+        m["gk"].push(0.5 * hl - _GK_OC * c**2)
+        self.log_prev = log_c
+        return self.estimates()
+
+    def estimates(self) -> dict:
+        m = self.moments
+        return combine(
+            self.window, self.trading_minutes, var_r=m["r"].get_var(), mean_hl=m["hl"].get_mean(),
+            mean_gk=m["gk"].get_mean(), var_o=m["o"].get_var(), var_c=m["c"].get_var(),
+        )
@@ -0,0 +1,92 @@
+import contextvars
+import gzip
+import json
+import os
+import time
+import requests
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from requests.adapters import HTTPAdapter
+from typing import Iterable, Iterator, Optional, Tuple
+from urllib3.util.retry import Retry
+from Instrumentation import record_http, record_io
+
+class ThetaClient:
+    def __init__(self, api_base="http://127.0.0.1:25510", cache_dir=None, max_workers=4, timeout=(5, 300), retries=5, backoff=0.5):
+        self.api_base = api_base
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_workers = max_workers
+        self.timeout = timeout
+
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(["GET"]),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _get(self, endpoint, url, params=None) -> requests.Response:
+        start = time.perf_counter()
+        r = self.session.get(url, params=params, timeout=self.timeout)
+        record_http(endpoint, time.perf_counter() - start, len(r.content), r.status_code)
+        r.raise_for_status()
+        return r
+
+    def get_response(self, endpoint, params=None) -> list:
+        r = self._get(endpoint, f"{self.api_base}{endpoint}", params)
+        payload = r.json()
+        response = payload["response"]
+
+        # large bulk_hist responses are paged through header.next_page
+        next_page = payload.get("header", {}).get("next_page")
+        while next_page and next_page != "null":
+            r = self._get(endpoint, next_page)
+            payload = r.json()
+            response.extend(payload["response"])
+            next_page = payload.get("header", {}).get("next_page")
+        return response
+
+    def _cache_file(self, cache_key) -> Path:
+        return self.cache_dir / f"{cache_key}.json.gz"
+
+    def is_cached(self, cache_key) -> bool:
+        return self.cache_dir is not None and cache_key is not None and self._cache_file(cache_key).exists()
+
+    def get_cached(self, endpoint, params=None, cache_key: Optional[str] = None) -> list:
+        if self.cache_dir is None or cache_key is None:
+            return self.get_response(endpoint, params)
+
+        path = self._cache_file(cache_key)
+        if path.exists():
+            record_io(read=path)
+            with gzip.open(path, "rt") as f:
+                return json.load(f)
+
+        response = self.get_response(endpoint, params)
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        with gzip.open(tmp_path, "wt") as f:
+            json.dump(response, f)
+        os.replace(tmp_path, path)
+        record_io(written=path)
+        return response
+
+    def fetch_many(self, requests_: Iterable[Tuple[str, dict, Optional[str]]]) -> Iterator[list]:
+        # responses come back in request order with at most 2 * max_workers held in memory; each request runs in
+        # a copy of the caller's context so its HTTP time is attributed to the caller's stage
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            pending = deque()
+            for endpoint, params, cache_key in requests_:
+                context = contextvars.copy_context()
+                pending.append(pool.submit(context.run, self.get_cached, endpoint, params, cache_key))
+                if len(pending) >= 2 * self.max_workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
@@ -3,21 +3,25 @@ import numpy as np
 from pathlib import Path
 import matplotlib.pyplot as plt
 import seaborn as sns
-from typing import Callable
+from typing import Callable, Optional
+from ESBarStore import ESBarStore
+from Instrumentation import instrumented
+from ResultCache import ResultCache
+from RollingVolKernels import ESTIMATORS, rolling_vol, warmup_rows
 
 class VolatilityEstimator:
-    def __init__(self, data_path="data", resample_interval="5T", trading_minutes=390):
+    def __init__(self, data_path="data", resample_interval="5T", trading_minutes=390, cache: Optional[ResultCache] = None):
         self.data_path = Path(data_path)
-        self.file = self.data_path / "es_futures_1m_all.csv"
+        self.store = ESBarStore(self.data_path)
+        self.cache = cache
         self.trading_minutes = trading_minutes
         self.interval = resample_interval
         self.df = self._load_data()
 
+    @instrumented()
     def _load_data(self):
-        df = pd.read_csv(self.file)
-        df["Datetime"] = pd.to_datetime(df["Datetime"])
-        df["date"] = df["Datetime"].dt.date
-        df = df.set_index("Datetime").sort_index()
+        df = self.store.load()
+        df["date"] = df.index.date
         return df
 
     def _resample(self, df):
@@ -29,79 +33,84 @@ class VolatilityEstimator:
             "Volume": "sum"
         }).dropna()
 
+    def _resample_sessions(self):
+        resampled = self._resample(self.df)
+        resampled["date"] = resampled.index.date
+        return resampled
+
+    def _mask_session_warmup(self, est, df, n, position=None):
+        # rolling over a multi-day frame crosses session boundaries; drop the rows a per-day rolling would not fill
+        if "date" not in df:
+            return est
+        if position is None:
+            position = df.groupby("date").cumcount()
+        return est.where(position >= n)
+
+    def estimate(self, df, windows=5, estimators=ESTIMATORS) -> pd.DataFrame:
+        # every estimator and window from one pass over the OHLC columns; columns get a _{w} suffix for several windows
+        windows = [windows] if np.isscalar(windows) else list(windows)
+        kernels = rolling_vol(
+            df["Open"].to_numpy(), df["High"].to_numpy(), df["Low"].to_numpy(), df["Close"].to_numpy(),
+            windows, self.trading_minutes, estimators,
+        )
+        position = df.groupby("date").cumcount() if "date" in df else None
+        columns = {}
+        for w, estimates in kernels.items():
+            suffix = f"_{w}" if len(windows) > 1 else ""
+            for name, values in estimates.items():
+                est = pd.Series(values, index=df.index)
+                columns[name + suffix] = self._mask_session_warmup(est, df, warmup_rows(name, w), position)
+        return pd.DataFrame(columns, index=df.index)
+
     def realized_vol(self, df, w=5):
-        r = np.log(df["Close"] / df["Close"].shift(1))
-        return r.rolling(w).std() * np.sqrt(self.trading_minutes / w)
+        return self.estimate(df, w, ["Realized"])["Realized"]
 
     def parkinson_vol(self, df, w=5):
-        hl = np.log(df["High"] / df["Low"]) ** 2
-        return np.sqrt((1 / (4 * np.log(2))) * hl.rolling(w).mean()) * np.sqrt(self.trading_minutes / w)
+        return self.estimate(df, w, ["Parkinson"])["Parkinson"]
 
     def garman_klass_vol(self, df, w=5):
-        oc = np.log(df["Close"] / df["Open"]) ** 2
-        hl = np.log(df["High"] / df["Low"]) ** 2
-        return np.sqrt((0.5 * hl - (2 * np.log(2) - 1) * oc).rolling(w).mean()) * np.sqrt(self.trading_minutes / w)
+        return self.estimate(df, w, ["GarmanKlass"])["GarmanKlass"]
 
     def yang_zhang_vol(self, df, w=5):
-        df = df.copy()
-        df["prev_close"] = df["Close"].shift(1)
-        o = np.log(df["Open"] / df["prev_close"])
-        c = np.log(df["Close"] / df["Open"])
-        rs = np.log(df["High"] / df["Low"]) ** 2
-        k = 0.34 / (1.34 + (w + 1) / (w - 1))
-        return np.sqrt(o.rolling(w).var() + k * rs.rolling(w).mean() + (1 - k) * c.rolling(w).var()) * np.sqrt(self.trading_minutes / w)
+        return self.estimate(df, w, ["YangZhang"])["YangZhang"]
 
+    @instrumented(rows_in=lambda self, window=5: len(self.df))
     def summarize_daily_stats(self, window=5):
-        summary = []
-
-        for date in np.unique(self.df["date"]):
-            daily_df = self.df[self.df["date"] == date]
-            resampled = self._resample(daily_df)
-
-            rv = self.realized_vol(resampled, window)
-            pv = self.parkinson_vol(resampled, window)
-            gv = self.garman_klass_vol(resampled, window)
-            yz = self.yang_zhang_vol(resampled, window)
-
-            summary.append({
-                "date": date,
-                "Realized_Mean": rv.mean(),
-                "Parkinson_Mean": pv.mean(),
-                "GarmanKlass_Mean": gv.mean(),
-                "YangZhang_Mean": yz.mean(),
-                "Realized_Std": rv.std(),
-                "Parkinson_Std": pv.std(),
-                "GarmanKlass_Std": gv.std(),
-                "YangZhang_Std": yz.std(),
-                "Realized_Range": rv.max() - rv.min(),
-                "Parkinson_Range": pv.max() - pv.min(),
-                "GarmanKlass_Range": gv.max() - gv.min(),
-                "YangZhang_Range": yz.max() - yz.min(),
-            })
-
-        return pd.DataFrame(summary)
-
+        if self.cache is None:
+            return self._summarize_daily_stats(window)
+        params = {"window": window, "interval": self.interval, "trading_minutes": self.trading_minutes}
+        return self.cache.memoize(
+            "summarize_daily_stats", lambda: self._summarize_daily_stats(window), params, [self.store.fingerprint_file()]
+        )
+
+    def _summarize_daily_stats(self, window):
+        resampled = self._resample_sessions()
+        estimates = self.estimate(resampled, window)
+
+        grouped = estimates.groupby(resampled["date"])
+        stats = {
+            "Mean": grouped.mean(),
+            "Std": grouped.std(),
+            "Range": grouped.max() - grouped.min(),
+        }
+        summary = pd.concat([stats[name].add_suffix(f"_{name}") for name in stats], axis=1)
+        return summary.rename_axis("date").reset_index()
+
+    @instrumented(rows_in=lambda self, *args, **kwargs: len(self.df))
     def analyze_vol_dislocation(self, estimator_func: Callable, estimator_name: str, window=5):
-        tz = self.df.index.tz or "America/New_York"
-        results = []
-
-        for date in np.unique(self.df["date"]):
-            daily_df = self.df[self.df["date"] == date]
-            resampled = self._resample(daily_df)
-            est_series = estimator_func(resampled, window)
-
-            auction_time = pd.Timestamp(f"{date} 09:30:00").tz_localize(tz)
-            if auction_time in est_series.index:
-                model_iv = est_series.loc[auction_time]
-                auction_iv = model_iv + np.random.normal(scale=0.001)  
-                results.append({
-                    "date": pd.to_datetime(date),
-                    "AuctionIV": auction_iv,
-                    estimator_name: model_iv,
-                    f"{estimator_name}Edge": auction_iv - model_iv
-                })
-
-        return pd.DataFrame(results)
+        resampled = self._resample_sessions()
+        est_series = estimator_func(resampled, window)
+
+        at_auction = est_series.index.time == pd.to_datetime("09:30:00").time()
+        model_iv = est_series[at_auction].to_numpy()
+        auction_iv = model_iv + np.random.normal(scale=0.001, size=len(model_iv))
+
+        return pd.DataFrame({
+            "date": pd.to_datetime(resampled.loc[at_auction, "date"].to_numpy()),
+            "AuctionIV": auction_iv,
+            estimator_name: model_iv,
+            f"{estimator_name}Edge": auction_iv - model_iv
+        })
 
     def plot_edge_summary(self, edge_df):
         estimators = ["Realized", "Parkinson", "GarmanKlass", "YangZhang"]
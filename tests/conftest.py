@@ -0,0 +1,16 @@
+import shutil
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path[:0] = [str(ROOT / "src"), str(ROOT)]
+
+
+@pytest.fixture(scope="session")
+def sample_data(tmp_path_factory) -> Path:
+    # the committed ES sample, copied so building its bar store never touches data/
+    data_path = tmp_path_factory.mktemp("data")
+    shutil.copy(ROOT / "data" / "es_futures_1m_all.csv", data_path)
+    return data_path
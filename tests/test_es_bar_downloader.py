@@ -0,0 +1,43 @@
+from benchmarks.synthetic import make_es_bars
+from ESBarDownloader import ESBarDownloader, RecordedBarProvider
+from ESBarStore import ESBarStore
+
+
+class FlakyProvider(RecordedBarProvider):
+    # fails every call for the windows in `failing` until heal() is called
+    def __init__(self, bars, failing):
+        super().__init__(bars)
+        self.failing = set(failing)
+
+    def heal(self):
+        self.failing.clear()
+
+    def fetch(self, start, end):
+        if (start, end) in self.failing:
+            raise ConnectionError("503 Service Unavailable")
+        return super().fetch(start, end)
+
+
+def _downloader(provider, store):
+    return ESBarDownloader(provider, store, max_days=7, max_workers=2, rate=1000, retries=1, backoff=0)
+
+
+def test_failed_window_is_refetched_by_the_next_incremental_run(tmp_path):
+    bars = make_es_bars(30, seed=4)
+    days = bars.index.tz_localize(None).normalize()
+    complete = ESBarStore(tmp_path / "complete")
+    complete.write(bars.iloc[:500])
+    _downloader(RecordedBarProvider(bars), complete).download(days[0], days[-1])
+
+    store = ESBarStore(tmp_path / "flaky")
+    store.write(bars.iloc[:500])
+    downloader = _downloader(None, store)
+    downloader.provider = FlakyProvider(bars, failing=downloader.plan(days[0], days[-1])[:1])
+
+    assert downloader.download(days[0], days[-1]).empty
+    assert len(store.load()) == 500
+
+    downloader.provider.heal()
+    downloader.download(days[0], days[-1])
+    assert store.load().index.equals(complete.load().index)
+    assert len(complete.load()) > 500
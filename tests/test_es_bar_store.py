@@ -0,0 +1,22 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks.synthetic import make_es_bars
+from ESBarStore import ESBarStore
+
+
+def _load_rows(data_path):
+    return len(ESBarStore(data_path).load())
+
+
+def test_concurrent_builds_leave_one_copy_of_each_bar(tmp_path):
+    bars = make_es_bars(5, seed=2)
+    bars.reset_index().to_csv(tmp_path / "es_futures_1m_all.csv", index=False)
+
+    context = multiprocessing.get_context("fork")
+    with ProcessPoolExecutor(max_workers=4, mp_context=context) as pool:
+        rows = list(pool.map(_load_rows, [tmp_path] * 8))
+
+    assert rows == [len(bars)] * 8
+    assert len(ESBarStore(tmp_path).load()) == len(bars)
+    assert not list(tmp_path.glob(".es_bars.*.tmp"))
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+from scipy.stats import ks_2samp
+
+from JumpDiffusionForecaster import JumpDiffusionForecaster
+
+S0 = 5000.0
+# enough jumps (about three per path) that the jump branch is exercised, not just the diffusion
+PARAMS = {"mu": 0.0, "sigma": 0.2, "lambda_": 20.0, "jump_mean": -0.002, "jump_std": 0.001}
+
+
+def loop_paths(n_paths, N, dt, S0, mu, sigma, lambda_, jump_mean, jump_std):
+    # reference copy of the original per-step simulate_paths loop
+    paths = np.zeros((n_paths, N))
+    paths[:, 0] = S0
+    for i in range(n_paths):
+        for t in range(1, N):
+            dW = np.random.normal(0, np.sqrt(dt))
+            dN = np.random.poisson(lambda_ * dt)
+            J = -abs(np.random.normal(jump_mean, jump_std)) if dN else 0
+            paths[i, t] = paths[i, t - 1] * np.exp((mu - 0.5 * sigma**2) * dt + sigma * dW + J)
+    return paths
+
+
+@pytest.fixture(scope="module")
+def forecaster(sample_data):
+    return JumpDiffusionForecaster(sample_data, n_paths=20_000, seed=11)
+
+
+def test_vectorized_paths_match_per_step_loop(forecaster):
+    np.random.seed(5)
+    reference = loop_paths(2_000, forecaster.N, forecaster.dt, S0, **PARAMS)
+    paths = forecaster.simulate_paths(S0, **PARAMS, seed=7)
+
+    assert paths.shape == (forecaster.n_paths, forecaster.N)
+    np.testing.assert_allclose(paths[:, 0], S0)
+    terminal = ks_2samp(np.log(paths[:, -1] / S0), np.log(reference[:, -1] / S0))
+    assert terminal.pvalue > 1e-3
+
+    def path_vols(p):
+        return np.std(np.log(p[:, 1:] / p[:, :-1]), axis=1)
+
+    assert ks_2samp(path_vols(paths), path_vols(reference)).pvalue > 1e-3
+
+
+def test_same_seed_reproduces_paths(sample_data, forecaster):
+    first = forecaster.simulate_paths(S0, **PARAMS, seed=3)
+    np.testing.assert_array_equal(first, forecaster.simulate_paths(S0, **PARAMS, seed=3))
+    assert not np.array_equal(first, forecaster.simulate_paths(S0, **PARAMS, seed=4))
+
+    # unseeded calls draw from the constructor seed's generator
+    a = JumpDiffusionForecaster(sample_data, n_paths=500, seed=21)
+    b = JumpDiffusionForecaster(sample_data, n_paths=500, seed=21)
+    np.testing.assert_array_equal(a.simulate_paths(S0, **PARAMS), b.simulate_paths(S0, **PARAMS))
+    assert a.forecast_volatility() == b.forecast_volatility()
@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from VolatilityEstimator import VolatilityEstimator
+
+
+class LoopEstimator:
+    # reference copy of the original per-day loop, fed the same bars as the batch estimator
+    def __init__(self, df, interval, trading_minutes):
+        self.df = df
+        self.interval = interval
+        self.trading_minutes = trading_minutes
+
+    def _resample(self, df):
+        return df.resample(self.interval).agg(
+            {"Open": "first", "High": "max", "Low": "min", "Close": "last", "Volume": "sum"}
+        ).dropna()
+
+    def realized_vol(self, df, w):
+        r = np.log(df["Close"] / df["Close"].shift(1))
+        return r.rolling(w).std() * np.sqrt(self.trading_minutes / w)
+
+    def parkinson_vol(self, df, w):
+        hl = np.log(df["High"] / df["Low"]) ** 2
+        return np.sqrt((1 / (4 * np.log(2))) * hl.rolling(w).mean()) * np.sqrt(self.trading_minutes / w)
+
+    def garman_klass_vol(self, df, w):
+        oc = np.log(df["Close"] / df["Open"]) ** 2
+        hl = np.log(df["High"] / df["Low"]) ** 2
+        return np.sqrt((0.5 * hl - (2 * np.log(2) - 1) * oc).rolling(w).mean()) * np.sqrt(self.trading_minutes / w)
+
+    def yang_zhang_vol(self, df, w):
+        o = np.log(df["Open"] / df["Close"].shift(1))
+        c = np.log(df["Close"] / df["Open"])
+        rs = np.log(df["High"] / df["Low"]) ** 2
+        k = 0.34 / (1.34 + (w + 1) / (w - 1))
+        return np.sqrt(o.rolling(w).var() + k * rs.rolling(w).mean() + (1 - k) * c.rolling(w).var()) * np.sqrt(self.trading_minutes / w)
+
+    def days(self):
+        for date in np.unique(self.df["date"]):
+            yield date, self._resample(self.df[self.df["date"] == date].drop(columns="date"))
+
+    def summarize_daily_stats(self, w):
+        summary = []
+        for date, resampled in self.days():
+            row = {"date": date}
+            for name, func in [("Realized", self.realized_vol), ("Parkinson", self.parkinson_vol),
+                               ("GarmanKlass", self.garman_klass_vol), ("YangZhang", self.yang_zhang_vol)]:
+                est = func(resampled, w)
+                row.update({f"{name}_Mean": est.mean(), f"{name}_Std": est.std(), f"{name}_Range": est.max() - est.min()})
+            summary.append(row)
+        return pd.DataFrame(summary)
+
+    def auction_estimates(self, func, w):
+        rows = []
+        for date, resampled in self.days():
+            est = func(resampled, w)
+            auction_time = pd.Timestamp(f"{date} 09:30:00").tz_localize(self.df.index.tz)
+            if auction_time in est.index:
+                rows.append((pd.Timestamp(date), est.loc[auction_time]))
+        return pd.DataFrame(rows, columns=["date", "model"])
+
+
+@pytest.fixture(scope="module")
+def estimators(sample_data):
+    batch = VolatilityEstimator(sample_data, resample_interval="5min")
+    return batch, LoopEstimator(batch.df, batch.interval, batch.trading_minutes)
+
+
+@pytest.mark.parametrize("window", [2, 5])
+def test_summarize_daily_stats_matches_per_day_loop(estimators, window):
+    batch, loop = estimators
+    expected = loop.summarize_daily_stats(window)
+    result = batch.summarize_daily_stats(window)[expected.columns]
+
+    assert list(result["date"]) == list(expected["date"])
+    values, reference = result.drop(columns="date").to_numpy(float), expected.drop(columns="date").to_numpy(float)
+    np.testing.assert_array_equal(np.isnan(values), np.isnan(reference))
+    np.testing.assert_allclose(values, reference, rtol=1e-8, atol=1e-9, equal_nan=True)
+
+
+@pytest.mark.parametrize("name", ["Realized", "Parkinson", "GarmanKlass", "YangZhang"])
+@pytest.mark.parametrize("window", [2, 5])
+def test_analyze_vol_dislocation_matches_per_day_loop(estimators, name, window):
+    batch, loop = estimators
+    batch_func = getattr(batch, {"Realized": "realized_vol", "Parkinson": "parkinson_vol",
+                                 "GarmanKlass": "garman_klass_vol", "YangZhang": "yang_zhang_vol"}[name])
+    expected = loop.auction_estimates(getattr(loop, batch_func.__name__), window)
+    result = batch.analyze_vol_dislocation(batch_func, name, window)
+
+    assert list(result["date"]) == list(expected["date"])
+    np.testing.assert_array_equal(np.isnan(result[name].to_numpy()), np.isnan(expected["model"].to_numpy()))
+    np.testing.assert_allclose(result[name], expected["model"], rtol=1e-8, atol=1e-9, equal_nan=True)
+    np.testing.assert_allclose(result["AuctionIV"] - result[name], result[f"{name}Edge"], atol=1e-15, equal_nan=True)